@@ -10,11 +10,29 @@ from api.api_setup import (
     ns_shipments,
     ns_supplier,
     ns_customer,
+    ns_predict,
 )
-from blockchain import blockchain
-from database.db import db
-from models.models import block_model, supplier_model, customer_model, shipment_model
+from blockchain.blockchain import get_blockchain
+from database.db import get_database
+from machine_learning.inference import FEATURE_COLUMNS, ModelUnavailableError, get_inference_engine
+from models.models import block_model, supplier_model, customer_model, shipment_model, prediction_model
 from api.validation_utils import Validator, ValidationError
+from api.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_BATCH_SIZE,
+    MAX_PAGE_SIZE,
+    NDJSON_MIMETYPE,
+    STREAM_CHUNK_SIZE,
+    binary_response,
+    chunked,
+    get_batch_items,
+    get_page_args,
+    ndjson_response,
+    not_modified,
+    page_params,
+    page_response,
+    wants_ndjson,
+)
 
 
 @api.doc(tags=["blockchain"])
@@ -23,48 +41,11 @@ class Transaction(Resource):
     @ns_blockchain.expect(block_model)
     def post(self):
         try:
-            required_fields = [
-                "product_id",
-                "transaction_detail",
-                "supplier_id",
-                "customer_id",
-                "quantity",
-                "shipment_date",
-                "expected_delivery_date",
-            ]
-            if not all(field in api.payload for field in required_fields):
-                return {"message": "All fields are required"}, 400
-
-            product_id = api.payload["product_id"]
-            transaction_detail = api.payload["transaction_detail"]
-            supplier_id = api.payload["supplier_id"]
-            customer_id = api.payload["customer_id"]
-            quantity = api.payload["quantity"]
-            shipment_date = api.payload["shipment_date"]
-            expected_delivery_date = api.payload["expected_delivery_date"]
-
-            # Use the Validator class for validation
-            Validator.validate_product_id(product_id)
-            Validator.validate_transaction_detail(transaction_detail)
-            Validator.validate_supplier_id(supplier_id)
-            Validator.validate_customer_id(customer_id)
-            Validator.validate_quantity(quantity)
-            Validator.validate_date(shipment_date)
-            Validator.validate_date(expected_delivery_date)
-
-            block_data = {
-                "product_id": product_id,
-                "transaction_detail": transaction_detail,
-                "supplier_id": supplier_id,
-                "customer_id": customer_id,
-                "quantity": quantity,
-                "shipment_date": shipment_date,
-                "expected_delivery_date": expected_delivery_date,
-            }
+            block_data = Validator.validate_transaction(api.payload)
             # Insert the transaction into the database
-            db.insert_transaction(block_data)
-            # Use the blockchain instance to add a block
-            blockchain.blockchain.add_block(block_data)
+            get_database().insert_transaction(block_data)
+            # Use the blockchain instance to add a block (or queue it for the next sealed batch)
+            get_blockchain().submit_transaction(block_data)
             return {"message": "Transaction recorded successfully"}, 200
         except ValidationError as e:
             return {"message": str(e)}, 400
@@ -78,19 +59,44 @@ class Transaction(Resource):
 @ns_blockchain.route("/get_chain")
 class Chain(Resource):
     @staticmethod
+    @ns_blockchain.doc(params={
+        "from_index": "First block index to return (default 0)",
+        "to_index": "Last block index to return, inclusive (default: the last block)",
+        "limit": f"Maximum number of blocks in a JSON response (default {DEFAULT_PAGE_SIZE}, max {MAX_PAGE_SIZE}); "
+                 f"streamed formats return the whole range unless a limit is given",
+        "format": "'json' (default), 'ndjson' for one block per line, or 'binary' for length-prefixed encoded blocks",
+    })
     def get():
-        chain_data = []
-        for block in blockchain.blockchain.blockchain:
-            chain_data.append(
-                {
-                    "index": block.index,
-                    "timestamp": block.timestamp,
-                    "data": block.data,
-                    "hash": block.block_hash,
-                    "previous_hash": block.previous_hash,
-                }
-            )
-        return {"length": len(chain_data), "chain": chain_data}, 200
+        length = get_blockchain().length()
+        from_index = request.args.get("from_index", 0, type=int)
+        to_index = request.args.get("to_index", type=int)
+        output_format = request.args.get("format", "json")
+        limit = request.args.get("limit", None if output_format != "json" else DEFAULT_PAGE_SIZE, type=int)
+        if from_index < 0 or (to_index is not None and to_index < from_index):
+            return {"message": f"Invalid range: from_index={from_index}, to_index={to_index}"}, 400
+        if output_format not in ("json", "ndjson", "binary"):
+            return {"message": f"Invalid format: {output_format}"}, 400
+        if limit is not None and (limit <= 0 or (output_format == "json" and limit > MAX_PAGE_SIZE)):
+            return {"message": f"Invalid limit: {limit}"}, 400
+
+        end = length if to_index is None else min(to_index + 1, length)
+        stop = max(from_index, end if limit is None else min(end, from_index + limit))
+
+        if output_format == "binary":
+            return binary_response(chunked(get_blockchain().iter_raw(from_index, stop)))
+        if output_format == "ndjson":
+            blocks = (block.to_dict() for block in get_blockchain().iter_blocks(from_index, stop))
+            return ndjson_response(chunked(blocks))
+
+        chain_data = [block.to_dict() for block in get_blockchain().iter_blocks(from_index, stop)]
+        next_from_index = stop if stop < end else None
+        return {
+            "length": length,
+            "from_index": from_index,
+            "to_index": stop - 1,
+            "next_from_index": next_from_index,
+            "chain": chain_data,
+        }, 200
 
 
 @api.doc(tags=["blockchain"])
@@ -98,38 +104,113 @@ class Chain(Resource):
 class BlockByIndex(Resource):
     @staticmethod
     def get(index):
-        block = next(
-            (block for block in blockchain.blockchain if block.index == index), None
-        )
+        block = get_blockchain().get_by_index(index)
         if block is None:
             return {"message": "Block not found"}, 404
-        return block.__dict__, 200
+        return block.to_dict(), 200
 
 
 @api.doc(tags=["blockchain"])
-@ns_blockchain.route("/get_block_by_hash/<string:hash>")
+@ns_blockchain.route("/get_block_by_hash/<string:block_hash>")
 class BlockByHash(Resource):
     @staticmethod
-    def get(_hash):
-        block = next(
-            (block for block in blockchain.blockchain if block.block_hash == _hash), None
-        )
+    def get(block_hash):
+        block = get_blockchain().get_by_hash(block_hash)
         if block is None:
             return {"message": "Block not found"}, 404
-        return block.__dict__, 200
+        return block.to_dict(), 200
+
+
+@api.doc(tags=["blockchain"])
+@ns_blockchain.route("/chain/verify")
+class ChainVerify(Resource):
+    @staticmethod
+    @ns_blockchain.doc(params={
+        "full": "Re-verify the whole chain instead of only the blocks added since the last verified checkpoint",
+        "workers": "Number of worker processes for a full verification (default: CPU count)",
+    })
+    def get():
+        full = request.args.get("full", "false").lower() in ("1", "true", "yes")
+        workers = request.args.get("workers", type=int)
+        return get_blockchain().verify(full=full, workers=workers), 200
+
+
+@api.doc(tags=["blockchain"])
+@ns_blockchain.route("/merkle_proof/<int:block_index>/<int:position>")
+class MerkleProof(Resource):
+    @staticmethod
+    def get(block_index, position):
+        try:
+            proof = get_blockchain().get_merkle_proof(block_index, position)
+        except (ValueError, IndexError) as e:
+            return {"message": str(e)}, 400
+        if proof is None:
+            return {"message": "Block not found"}, 404
+        return proof, 200
 
 
 @api.doc(tags=["transactions"])
-@ns_transactions.route("/transactions/<int:id>")
+@ns_transactions.route("/transactions/<int:_id>")
 class TransactionByID(Resource):
     @staticmethod
     def get(_id):
-        transaction = db.get_transaction_by_id(_id)
+        transaction = get_database().get_transaction_by_id(_id)
         if transaction is None:
             return {"message": "Transaction not found"}, 404
         return transaction, 200
 
 
+@api.doc(tags=["transactions"])
+@ns_transactions.route("/batch")
+class TransactionBatch(Resource):
+    @staticmethod
+    @ns_transactions.doc(description=f"Record up to {MAX_BATCH_SIZE} transactions sent as a JSON array of "
+                                     f"transaction objects or as {NDJSON_MIMETYPE}. Valid items are written in one "
+                                     f"database transaction and sealed into one ledger block; each item gets its "
+                                     f"own status in the response.")
+    def post():
+        try:
+            items = get_batch_items()
+        except ValidationError as e:
+            return {"message": str(e)}, 400
+
+        # Lines that failed to parse are validated as empty items and then reported with their parse error
+        parse_errors = {position: str(item) for position, item in enumerate(items) if isinstance(item, ValidationError)}
+        mask, errors, rows = Validator.validate_transactions_bulk(items)
+        valid = [row for row in rows if row is not None]
+        results = [
+            {"index": position, "status": "accepted"} if ok
+            else {"index": position, "status": "rejected", "error": parse_errors.get(position, errors[position])}
+            for position, ok in enumerate(mask)
+        ]
+
+        block_index = None
+        if valid:
+            try:
+                transaction_ids = get_database().insert_transactions_bulk(valid)
+                block = get_blockchain().seal_transactions(valid)
+            except Exception as e:
+                return {
+                    "message": f"An error occurred while processing the batch: {str(e)}"
+                }, 500
+            block_index = block.index
+            # Accepted items are numbered in request order, which is also their position in the sealed block
+            accepted = (result for result in results if result["status"] == "accepted")
+            for leaf, (result, transaction_id) in enumerate(zip(accepted, transaction_ids)):
+                result["transaction_id"] = transaction_id
+                result["block_index"] = block_index
+                result["position"] = leaf
+
+        rejected = len(items) - len(valid)
+        status = 200 if not rejected else 207 if valid else 400
+        return {
+            "accepted": len(valid),
+            "rejected": rejected,
+            "block_index": block_index,
+            "results": results,
+        }, status
+
+
 @api.doc(tags=["supplier"])
 @ns_supplier.route("/create_supplier")
 class Supplier(Resource):
@@ -137,7 +218,7 @@ class Supplier(Resource):
     @ns_supplier.expect(supplier_model)
     def post():
         supplier = api.payload
-        db.insert_supplier(supplier)
+        get_database().insert_supplier(supplier)
         return {"message": "Supplier added successfully"}, 201
 
 
@@ -148,7 +229,7 @@ class Customer(Resource):
     @ns_customer.expect(customer_model)
     def post():
         customer = api.payload
-        db.insert_customer(customer)
+        get_database().insert_customer(customer)
         return {"message": "Customer added successfully"}, 201
 
 
@@ -156,17 +237,24 @@ class Customer(Resource):
 @ns_products.route("/get_all_products")
 class Products(Resource):
     @staticmethod
+    @ns_products.doc(params=page_params)
     def get():
-        products = db.get_all_products()
-        return {"products": products}, 200
+        try:
+            after_id, limit = get_page_args()
+        except ValidationError as e:
+            return {"message": str(e)}, 400
+        if wants_ndjson():
+            return ndjson_response(get_database().iter_products(after_id, STREAM_CHUNK_SIZE))
+        products, etag = get_database().get_products_page_with_etag(after_id, limit)
+        return not_modified(etag) or page_response("products", products, limit, etag)
 
 
 @api.doc(tags=["products"])
-@ns_products.route("/get_product_by_id/<int:id>")
+@ns_products.route("/get_product_by_id/<int:_id>")
 class ProductByID(Resource):
     @staticmethod
     def get(_id):
-        product = db.get_product_by_id(_id)
+        product = get_database().get_product_by_id(_id)
         if product is None:
             return {"message": "Product not found"}, 404
         return product, 200
@@ -176,22 +264,44 @@ class ProductByID(Resource):
 @ns_inventory.route("/get_all_inventory")
 class Inventory(Resource):
     @staticmethod
+    @ns_inventory.doc(params=page_params)
     def get():
-        inventory = db.get_inventory()
-        return {"inventory": inventory}, 200
+        try:
+            after_id, limit = get_page_args()
+        except ValidationError as e:
+            return {"message": str(e)}, 400
+        if wants_ndjson():
+            return ndjson_response(get_database().iter_inventory(after_id, STREAM_CHUNK_SIZE))
+        inventory, etag = get_database().get_inventory_page_with_etag(after_id, limit)
+        return not_modified(etag) or page_response("inventory", inventory, limit, etag)
 
 
 @api.doc(tags=["inventory"])
-@ns_inventory.route("/get_inventory_by_product_id/<int:product_id>")
+@ns_inventory.route("/get_inventory_by_product_id/<string:product_id>")
 class InventoryByProductID(Resource):
     @staticmethod
     def get(product_id):
-        inventory = db.get_inventory_by_product_id(product_id)
+        inventory = get_database().get_inventory_by_product_id(product_id)
         if inventory is None:
             return {"message": "Inventory not found"}, 404
         return inventory, 200
 
 
+@api.doc(tags=["inventory"])
+@ns_inventory.route("/stock_level/<string:product_id>")
+class StockLevel(Resource):
+    @staticmethod
+    @ns_inventory.doc(description="Stock of a product. on_hand is inventory_quantity minus shipment_quantity, the "
+                                  "quantity received minus the quantity shipped. Transactions are not subtracted, "
+                                  "since each one is shipped under the same id; transaction_quantity is returned "
+                                  "so inventory minus ordered quantities can be computed from the same response.")
+    def get(product_id):
+        stock_level = get_database().get_stock_level(product_id)
+        if stock_level is None:
+            return {"message": "No stock recorded for this product"}, 404
+        return stock_level, 200
+
+
 @api.doc(tags=["shipments"])
 @ns_shipments.route("/create_shipment")
 class Shipment(Resource):
@@ -200,7 +310,7 @@ class Shipment(Resource):
         if request.headers.get('Content-Type') != 'application/json':
             return {"message": "Unsupported Media Type: Content-Type must be 'application/json'"}, 415
         shipment = api.payload
-        db.insert_shipment(shipment)
+        get_database().insert_shipment(shipment)
         return {"message": "Shipment added successfully"}, 201
 
 
@@ -208,6 +318,69 @@ class Shipment(Resource):
 @ns_transactions.route("/get_all_transactions")
 class Transactions(Resource):
     @staticmethod
+    @ns_transactions.doc(params=page_params)
     def get():
-        transactions = db.get_all_transactions()
-        return {"transactions": transactions}, 200
+        try:
+            after_id, limit = get_page_args()
+        except ValidationError as e:
+            return {"message": str(e)}, 400
+        if wants_ndjson():
+            return ndjson_response(get_database().iter_transactions(after_id, STREAM_CHUNK_SIZE))
+        transactions = get_database().get_transactions_page(after_id, limit)
+        return page_response("transactions", transactions, limit)
+
+
+@api.doc(tags=["predict"])
+@ns_predict.route("")
+class Prediction(Resource):
+    @staticmethod
+    @ns_predict.expect(prediction_model)
+    @ns_predict.doc(description=f"Predict the transaction quantity for one feature object, or for a JSON array of up "
+                                f"to {MAX_BATCH_SIZE} of them. Concurrent requests are scored together in "
+                                f"micro-batches by the inference engine.")
+    def post():
+        payload = request.get_json(silent=True)
+        try:
+            if isinstance(payload, list):
+                if not payload:
+                    raise ValidationError("The batch is empty")
+                if len(payload) > MAX_BATCH_SIZE:
+                    raise ValidationError(f"Batch of {len(payload)} items exceeds the maximum of {MAX_BATCH_SIZE}")
+                rows = [Validator.validate_features(item, FEATURE_COLUMNS) for item in payload]
+            else:
+                rows = [Validator.validate_features(payload, FEATURE_COLUMNS)]
+        except ValidationError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            predictions = get_inference_engine().predict(rows)
+        except ModelUnavailableError as e:
+            return {"message": str(e)}, 503
+        if isinstance(payload, list):
+            return {"predictions": predictions}, 200
+        return {"prediction": predictions[0]}, 200
+
+
+@api.doc(tags=["predict"])
+@ns_predict.route("/transaction/<int:transaction_id>")
+class TransactionPrediction(Resource):
+    @staticmethod
+    @ns_predict.doc(description="Predict the quantity of a recorded transaction from its features in the feature "
+                                "store. A transaction has one row per inventory row of its product.")
+    def get(transaction_id):
+        try:
+            rows, predictions = get_inference_engine().predict_transactions([transaction_id])
+        except ModelUnavailableError as e:
+            return {"message": str(e)}, 503
+        if not predictions:
+            return {"message": "Transaction not found"}, 404
+        features = [
+            {name: rows[name][position].item() for name in FEATURE_COLUMNS}
+            for position in range(len(predictions))
+        ]
+        return {
+            "transaction_id": transaction_id,
+            "features": features,
+            "actual": rows["trans_quantity"].tolist(),
+            "predictions": predictions,
+        }, 200
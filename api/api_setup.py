@@ -13,3 +13,4 @@ ns_inventory = api.namespace("inventory", description="Inventory operations")
 ns_shipments = api.namespace("shipments", description="Shipment operations")
 ns_supplier = api.namespace("supplier", description="Supplier operations")
 ns_customer = api.namespace("customer", description="Customer operations")
+ns_predict = api.namespace("predict", description="Model predictions")
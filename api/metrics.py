@@ -0,0 +1,183 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+# Upper bounds of the latency histogram buckets in microseconds; one extra bucket catches everything slower
+LATENCY_BUCKETS_US = (
+    100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000, 2500000, 5000000,
+)
+PERCENTILES = (50, 90, 99)
+UNMATCHED_ENDPOINT = "<unmatched>"
+
+
+class _EndpointStats:
+    __slots__ = ("count", "errors", "client_errors", "total_us", "max_us", "buckets")
+
+    def __init__(self, bucket_count):
+        self.count = 0
+        self.errors = 0
+        self.client_errors = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.buckets = [0] * bucket_count
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.client_errors += other.client_errors
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+        for position, value in enumerate(other.buckets):
+            self.buckets[position] += value
+
+
+class _ThreadMetrics:
+    __slots__ = ("started", "finished", "endpoints")
+
+    def __init__(self):
+        self.started = 0
+        self.finished = 0
+        self.endpoints = {}
+
+
+class RequestMetrics:
+    # Each thread only ever writes to its own counters, so recording a request takes no lock. The registry
+    # lock is taken once per new thread and by snapshot(), which sums the per-thread counters and folds the
+    # counters of finished threads (the threaded dev server uses one thread per request) into _retired.
+    def __init__(self, buckets=LATENCY_BUCKETS_US):
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._local = threading.local()
+        self._threads = []
+        self._retired = _ThreadMetrics()
+        self._registry_lock = threading.Lock()
+        # name -> callable returning a dict, reported alongside the request metrics
+        self._sources = {}
+
+    def _thread_metrics(self):
+        metrics = getattr(self._local, "metrics", None)
+        if metrics is None:
+            metrics = _ThreadMetrics()
+            self._local.metrics = metrics
+            with self._registry_lock:
+                self._prune()
+                self._threads.append((threading.current_thread(), metrics))
+        return metrics
+
+    def _prune(self):
+        # Callers hold _registry_lock
+        live = []
+        for thread, metrics in self._threads:
+            if thread.is_alive():
+                live.append((thread, metrics))
+            else:
+                self._merge_into(self._retired, metrics)
+        self._threads = live
+
+    def _merge_into(self, target, metrics):
+        target.started += metrics.started
+        target.finished += metrics.finished
+        for endpoint, stats in metrics.endpoints.items():
+            merged = target.endpoints.get(endpoint)
+            if merged is None:
+                merged = target.endpoints[endpoint] = _EndpointStats(len(self.buckets) + 1)
+            merged.merge(stats)
+
+    def add_source(self, name, stats):
+        self._sources[name] = stats
+
+    def start(self):
+        self._thread_metrics().started += 1
+        return time.perf_counter_ns()
+
+    def finish(self, endpoint, started_ns, status_code):
+        elapsed_us = (time.perf_counter_ns() - started_ns) // 1000
+        metrics = self._thread_metrics()
+        stats = metrics.endpoints.get(endpoint)
+        if stats is None:
+            stats = metrics.endpoints[endpoint] = _EndpointStats(len(self.buckets) + 1)
+        stats.count += 1
+        stats.total_us += elapsed_us
+        if elapsed_us > stats.max_us:
+            stats.max_us = elapsed_us
+        stats.buckets[bisect_left(self.buckets, elapsed_us)] += 1
+        if status_code >= 500:
+            stats.errors += 1
+        elif status_code >= 400:
+            stats.client_errors += 1
+        metrics.finished += 1
+
+    def _percentile(self, buckets, count, percentile):
+        # Upper bound of the bucket holding the percentile; None when it falls in the open-ended bucket
+        rank = count * percentile / 100.0
+        seen = 0
+        for position, value in enumerate(buckets):
+            seen += value
+            if seen >= rank:
+                return self.buckets[position] if position < len(self.buckets) else None
+        return None
+
+    def snapshot(self):
+        total = _ThreadMetrics()
+        with self._registry_lock:
+            self._prune()
+            self._merge_into(total, self._retired)
+            for _, metrics in self._threads:
+                self._merge_into(total, metrics)
+
+        endpoints = {}
+        for endpoint, stats in sorted(total.endpoints.items()):
+            summary = {
+                "count": stats.count,
+                "errors": stats.errors,
+                "client_errors": stats.client_errors,
+                "mean_us": stats.total_us // stats.count if stats.count else 0,
+                "max_us": stats.max_us,
+                "histogram_us": {
+                    **{str(bound): value for bound, value in zip(self.buckets, stats.buckets)},
+                    "+Inf": stats.buckets[-1],
+                },
+            }
+            for percentile in PERCENTILES:
+                summary[f"p{percentile}_us"] = self._percentile(stats.buckets, stats.count, percentile)
+            endpoints[endpoint] = summary
+
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "requests": total.finished,
+            "in_flight": total.started - total.finished,
+            "errors": sum(stats.errors for stats in total.endpoints.values()),
+            "endpoints": endpoints,
+            **{name: stats() for name, stats in self._sources.items()},
+        }
+
+    def init_app(self, app, path="/metrics"):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule(path, "metrics", self.snapshot)
+
+    def _before_request(self):
+        g.metrics_started_ns = self.start()
+
+    @staticmethod
+    def _endpoint_name():
+        rule = request.url_rule
+        return f"{request.method} {rule.rule}" if rule is not None else UNMATCHED_ENDPOINT
+
+    def _after_request(self, response):
+        started_ns = g.pop("metrics_started_ns", None)
+        if started_ns is not None:
+            self.finish(self._endpoint_name(), started_ns, response.status_code)
+        return response
+
+    def _teardown_request(self, error=None):
+        # Only still set when the request failed before a response was produced
+        started_ns = g.pop("metrics_started_ns", None)
+        if started_ns is not None:
+            self.finish(self._endpoint_name(), started_ns, 500)
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,103 @@
+import json
+import struct
+
+from flask import Response, request
+
+from api.validation_utils import ValidationError
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+NDJSON_MIMETYPE = "application/x-ndjson"
+BINARY_MIMETYPE = "application/octet-stream"
+_RECORD_LENGTH = struct.Struct(">I")
+
+page_params = {
+    "after_id": "Return rows with an id greater than this value (keyset cursor)",
+    "limit": f"Maximum number of rows to return (default {DEFAULT_PAGE_SIZE}, max {MAX_PAGE_SIZE})",
+    "format": "Set to 'ndjson' to stream every row after after_id as newline-delimited JSON",
+}
+
+
+def get_page_args():
+    after_id = request.args.get("after_id", 0, type=int)
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    if after_id < 0:
+        raise ValidationError(f"Invalid after_id: {after_id}")
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"Invalid limit: {limit} (must be between 1 and {MAX_PAGE_SIZE})")
+    return after_id, limit
+
+
+def wants_ndjson():
+    if request.args.get("format") == "ndjson":
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def get_batch_items():
+    # A JSON array, or one JSON document per line when sent as NDJSON. Lines that do not parse are
+    # returned as ValidationError instances so they can be reported per item.
+    if request.mimetype == NDJSON_MIMETYPE:
+        items = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValidationError(f"Invalid JSON on line {number}: {e}"))
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            raise ValidationError(f"Expected a JSON array or an {NDJSON_MIMETYPE} body")
+    if not items:
+        raise ValidationError("The batch is empty")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValidationError(f"Batch of {len(items)} items exceeds the maximum of {MAX_BATCH_SIZE}")
+    return items
+
+
+def chunked(items, size=STREAM_CHUNK_SIZE):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def page_response(key, rows, limit, etag=None):
+    # The id is always the first column; a short page means there is nothing after it
+    next_after_id = rows[-1][0] if len(rows) == limit else None
+    if etag is None:
+        return {key: rows, "next_after_id": next_after_id}, 200
+    return {key: rows, "next_after_id": next_after_id}, 200, {"ETag": f'"{etag}"'}
+
+
+def not_modified(etag):
+    # A 304 for clients that already hold this page (If-None-Match), or None to send it in full
+    if etag is None or not request.if_none_match.contains(etag):
+        return None
+    return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+
+def ndjson_response(chunks):
+    # Rows are serialized one chunk at a time as the client reads, so memory stays flat
+    def generate():
+        for chunk in chunks:
+            yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+    return Response(generate(), mimetype=NDJSON_MIMETYPE)
+
+
+def binary_response(chunks):
+    # Length-prefixed records ([u32 big-endian length][record]), the same framing as the ledger segments
+    def generate():
+        for chunk in chunks:
+            yield b"".join(_RECORD_LENGTH.pack(len(record)) + bytes(record) for record in chunk)
+
+    return Response(generate(), mimetype=BINARY_MIMETYPE)
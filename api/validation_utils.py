@@ -1,5 +1,39 @@
 import datetime
-from voluptuous import Schema, All, Length, Match, Range, Invalid
+import math
+from voluptuous import Schema, All, Any, Length, Match, Range, Invalid
+
+# \Z rather than $, which would also match before a trailing newline
+PRODUCT_ID_PATTERN = r"^[A-Za-z0-9]{6,10}\Z"
+DATE_PATTERN = r"^(\d{4})-(\d{2})-(\d{2})\Z"
+DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _finite_number(value):
+    # bool is a subclass of int and NaN/inf are floats; none of them is a usable model input. An int too large
+    # for a float is not one either.
+    try:
+        if isinstance(value, bool) or not math.isfinite(value):
+            raise Invalid("Expected a finite number")
+    except OverflowError:
+        raise Invalid("Expected a finite number")
+    return value
+
+
+# Compiled once at import; building a Schema is far more expensive than applying one
+PRODUCT_ID_SCHEMA = Schema(All(str, Length(min=6, max=10), Match(PRODUCT_ID_PATTERN)))
+NON_EMPTY_STRING_SCHEMA = Schema(All(str, Length(min=1)))
+NON_NEGATIVE_INT_SCHEMA = Schema(All(int, Range(min=0)))
+NON_NEGATIVE_FLOAT_SCHEMA = Schema(All(float, Range(min=0)))
+DATE_SCHEMA = Schema(All(str, Match(DATE_PATTERN)))
+NUMBER_SCHEMA = Schema(All(Any(int, float), _finite_number))
+
+
+class _Missing:
+    pass
+
+
+# Stands in for absent fields in the column-wise validators
+_MISSING = _Missing()
 
 
 class ValidationError(Exception):
@@ -7,6 +41,16 @@ class ValidationError(Exception):
 
 
 class Validator:
+    TRANSACTION_FIELDS = (
+        "product_id",
+        "transaction_detail",
+        "supplier_id",
+        "customer_id",
+        "quantity",
+        "shipment_date",
+        "expected_delivery_date",
+    )
+
     @staticmethod
     def validate(schema, data):
         try:
@@ -16,43 +60,186 @@ class Validator:
 
     @staticmethod
     def validate_product_id(product_id):
-        schema = Schema(All(str, Length(min=6, max=10), Match(r"^[A-Za-z0-9]{6,10}$")))
-        return Validator.validate(schema, product_id)
+        return Validator.validate(PRODUCT_ID_SCHEMA, product_id)
 
     @staticmethod
     def validate_transaction_detail(transaction_detail):
-        schema = Schema(All(str, Length(min=1)))
-        return Validator.validate(schema, transaction_detail)
+        return Validator.validate(NON_EMPTY_STRING_SCHEMA, transaction_detail)
 
     @staticmethod
     def validate_id(_id):
-        schema = Schema(All(int, Range(min=0)))
-        return Validator.validate(schema, _id)
+        return Validator.validate(NON_NEGATIVE_INT_SCHEMA, _id)
 
     @staticmethod
     def validate_quantity(quantity):
-        schema = Schema(All(int, Range(min=0)))
-        return Validator.validate(schema, quantity)
+        return Validator.validate(NON_NEGATIVE_INT_SCHEMA, quantity)
 
     @staticmethod
     def validate_price(price):
-        schema = Schema(All(float, Range(min=0)))
-        return Validator.validate(schema, price)
+        return Validator.validate(NON_NEGATIVE_FLOAT_SCHEMA, price)
 
     @staticmethod
     def validate_address(address):
-        schema = Schema(All(str, Length(min=1)))
-        return Validator.validate(schema, address)
+        return Validator.validate(NON_EMPTY_STRING_SCHEMA, address)
 
     @staticmethod
     def validate_date(date):
-        schema = Schema(All(str, Match(r"^\d{4}-\d{2}-\d{2}$")))
+        # The pattern guarantees YYYY-MM-DD, so fromisoformat only has to reject impossible dates
         try:
-            datetime.datetime.strptime(date, "%Y-%m-%d")
-            return Validator.validate(schema, date)
-        except ValueError:
+            DATE_SCHEMA(date)
+            datetime.date.fromisoformat(date)
+            return date
+        except (Invalid, ValueError):
             raise ValidationError(f"Invalid date: {date}")
 
+    @staticmethod
+    def validate_transaction(transaction):
+        # Returns the transaction reduced to its known fields
+        if not isinstance(transaction, dict) or not all(field in transaction for field in Validator.TRANSACTION_FIELDS):
+            raise ValidationError("All fields are required")
+        Validator.validate_product_id(transaction["product_id"])
+        Validator.validate_transaction_detail(transaction["transaction_detail"])
+        Validator.validate_supplier_id(transaction["supplier_id"])
+        Validator.validate_customer_id(transaction["customer_id"])
+        Validator.validate_quantity(transaction["quantity"])
+        Validator.validate_date(transaction["shipment_date"])
+        Validator.validate_date(transaction["expected_delivery_date"])
+        return {field: transaction[field] for field in Validator.TRANSACTION_FIELDS}
+
+    @staticmethod
+    def validate_features(features, names):
+        # One row of model input; returns its values in the order of names
+        if not isinstance(features, dict) or not all(name in features for name in names):
+            raise ValidationError("All fields are required")
+        return [Validator.validate(NUMBER_SCHEMA, features[name]) for name in names]
+
+    @staticmethod
+    def validate_transaction_columns(columns):
+        # Bulk counterpart of validate_transaction: columns maps each field to a sequence (a list, NumPy array,
+        # pandas Series or DataFrame column) and every rule is applied to a whole column of NumPy arrays at once.
+        # Returns a boolean mask of valid rows and a list holding, for each row, None or the message
+        # validate_transaction would have raised for it.
+        import numpy as np
+
+        arrays = {field: _object_array(columns[field]) for field in Validator.TRANSACTION_FIELDS}
+        types = {field: np.fromiter(map(type, array), dtype=object, count=len(array))
+                 for field, array in arrays.items()}
+        length = len(arrays[Validator.TRANSACTION_FIELDS[0]])
+        present = np.ones(length, dtype=bool)
+        for field_types in types.values():
+            present &= field_types != _Missing
+
+        checks = (
+            ("product_id", _valid_product_ids(arrays["product_id"], types["product_id"]), "Invalid data: {}"),
+            ("transaction_detail", _valid_non_empty_strings(arrays["transaction_detail"], types["transaction_detail"]),
+             "Invalid data: {}"),
+            ("supplier_id", _valid_non_negative_ints(arrays["supplier_id"], types["supplier_id"]), "Invalid data: {}"),
+            ("customer_id", _valid_non_negative_ints(arrays["customer_id"], types["customer_id"]), "Invalid data: {}"),
+            ("quantity", _valid_non_negative_ints(arrays["quantity"], types["quantity"]), "Invalid data: {}"),
+            ("shipment_date", _valid_dates(arrays["shipment_date"], types["shipment_date"]), "Invalid date: {}"),
+            ("expected_delivery_date", _valid_dates(arrays["expected_delivery_date"], types["expected_delivery_date"]),
+             "Invalid date: {}"),
+        )
+        valid = present.copy()
+        for _, mask, _ in checks:
+            valid &= mask
+
+        # Messages are only built for the failing rows, reporting the first failing field as the scalar path does
+        errors = [None] * length
+        for row in np.flatnonzero(~valid):
+            if not present[row]:
+                errors[row] = "All fields are required"
+                continue
+            for field, mask, message in checks:
+                if not mask[row]:
+                    errors[row] = message.format(arrays[field][row])
+                    break
+        return valid, errors
+
+    @staticmethod
+    def validate_transactions_bulk(transactions):
+        # Like validate_transaction for a list of payloads; returns (valid mask, per-row errors, cleaned rows)
+        columns = {field: [] for field in Validator.TRANSACTION_FIELDS}
+        for transaction in transactions:
+            if not isinstance(transaction, dict):
+                transaction = {}
+            for field, values in columns.items():
+                values.append(transaction.get(field, _MISSING))
+        valid, errors = Validator.validate_transaction_columns(columns)
+        rows = [
+            {field: transaction[field] for field in Validator.TRANSACTION_FIELDS} if ok else None
+            for transaction, ok in zip(transactions, valid)
+        ]
+        return valid, errors, rows
+
     # Use validate_id for supplier_id and customer_id
     validate_supplier_id = validate_id
     validate_customer_id = validate_id
+
+
+def _object_array(values):
+    import numpy as np
+
+    # fromiter keeps each value as one element even when values are themselves lists
+    values = list(values)
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+def _string_lengths(array, is_str):
+    import numpy as np
+
+    return np.fromiter(map(len, np.where(is_str, array, "")), dtype=np.int64, count=len(array))
+
+
+def _code_points(array, mask, width):
+    # (n, width) array of the Unicode code points of the masked strings (at most width long), zero-padded;
+    # rows outside the mask are all zeros
+    import numpy as np
+
+    return np.array(np.where(mask, array, ""), dtype=f"U{width}").view(np.uint32).reshape(len(array), width)
+
+
+def _valid_product_ids(array, types):
+    import numpy as np
+
+    # Same rule as PRODUCT_ID_PATTERN: 6 to 10 ASCII letters or digits
+    is_str = types == str
+    lengths = _string_lengths(array, is_str)
+    fits = is_str & (lengths >= 6) & (lengths <= 10)
+    codes = _code_points(array, fits, 10)
+    alphanumeric = (((codes >= 48) & (codes <= 57)) | ((codes >= 65) & (codes <= 90))
+                    | ((codes >= 97) & (codes <= 122)))
+    in_string = np.arange(10) < lengths[:, None]
+    return fits & np.all(alphanumeric | ~in_string, axis=1)
+
+
+def _valid_non_empty_strings(array, types):
+    is_str = types == str
+    return is_str & (_string_lengths(array, is_str) >= 1)
+
+
+def _valid_non_negative_ints(array, types):
+    import numpy as np
+
+    # voluptuous' int check is an isinstance check, so bools pass and floats such as 1.0 do not
+    is_int = (types == int) | (types == bool)
+    return is_int & (np.where(is_int, array, -1) >= 0).astype(bool)
+
+
+def _valid_dates(array, types):
+    import numpy as np
+
+    # YYYY-MM-DD with ASCII digits, checked against the real calendar
+    is_str = types == str
+    fits = is_str & (_string_lengths(array, is_str) == 10)
+    codes = _code_points(array, fits, 10)
+    digits = codes.astype(np.int64) - 48
+    digit_positions = [0, 1, 2, 3, 5, 6, 8, 9]
+    shaped = (fits & np.all((digits[:, digit_positions] >= 0) & (digits[:, digit_positions] <= 9), axis=1)
+              & (codes[:, 4] == 45) & (codes[:, 7] == 45))
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days = np.array(DAYS_IN_MONTH)[np.clip(month, 1, 12) - 1] + (leap & (month == 2))
+    return shaped & (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= days)
@@ -12,38 +12,20 @@ from api.api_resources import (
 from api.api_setup import (
     api,
 )
-from database.db import SupplyChainDatabase
+from api.metrics import request_metrics
+from blockchain.blockchain import get_blockchain
+from database.db import get_database
 from log_config.logging_config import logging_config
+from machine_learning.inference import get_inference_engine
 
-logging_config.configure_logger()
-logging_config.configure_eliot()
-logging_config.initialize_spinner()
-
-app = Flask(__name__)
-api.init_app(app)
-
-# Initialize the database object
-db = SupplyChainDatabase()
-
-# Add the resources to the API
-api.add_resource(Products, "/products", resource_class_kwargs={"db": db})
-api.add_resource(Inventory, "/inventory", resource_class_kwargs={"db": db})
-api.add_resource(Shipment, "/shipments", resource_class_kwargs={"db": db})
-api.add_resource(Transaction, "/transactions", resource_class_kwargs={"db": db})
-api.add_resource(Chain, "/chain", resource_class_kwargs={"db": db})
-api.add_resource(Supplier, "/supplier", resource_class_kwargs={"db": db})
-api.add_resource(Customer, "/customer", resource_class_kwargs={"db": db})
-
-
-@app.before_request
-def before_request():
-    logging_config.start_spinner()
-
-
-@app.after_request
-def after_request(response):
-    logging_config.stop_spinner()
-    return response
+# Add the resources to the API; they are registered on the app by api.init_app in create_app
+api.add_resource(Products, "/products")
+api.add_resource(Inventory, "/inventory")
+api.add_resource(Shipment, "/shipments")
+api.add_resource(Transaction, "/transactions")
+api.add_resource(Chain, "/chain")
+api.add_resource(Supplier, "/supplier")
+api.add_resource(Customer, "/customer")
 
 
 @api.errorhandler(Exception)
@@ -51,5 +33,22 @@ def handle_exception(error):
     return {"message": str(error)}, 500
 
 
+def create_app():
+    # Bootstrap: logging sinks, the database schema and the ledger are set up here, once per process,
+    # rather than as a side effect of importing the modules that use them
+    logging_config.configure()
+    database = get_database()
+    get_blockchain()
+
+    app = Flask(__name__)
+    api.init_app(app)
+    # Per-endpoint latency histograms, in-flight and error counts, served on /metrics
+    request_metrics.init_app(app)
+    request_metrics.add_source("logging", logging_config.stats)
+    request_metrics.add_source("read_cache", database.get_cache_stats)
+    request_metrics.add_source("inference", get_inference_engine().stats)
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,107 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_migrations import migrate  # noqa: E402
+
+SCHEMA = (
+    "CREATE TABLE transactions (id INTEGER PRIMARY KEY, product_id TEXT NOT NULL, transaction_detail TEXT NOT NULL, "
+    "supplier_id INTEGER NOT NULL, customer_id INTEGER NOT NULL, quantity INTEGER NOT NULL, "
+    "shipment_date TEXT NOT NULL, expected_delivery_date TEXT NOT NULL)",
+    "CREATE TABLE suppliers (id INTEGER PRIMARY KEY, name TEXT NOT NULL, address TEXT NOT NULL)",
+    "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL, address TEXT NOT NULL)",
+    "CREATE TABLE products (id INTEGER PRIMARY KEY, product_id TEXT NOT NULL, name TEXT NOT NULL, "
+    "description TEXT NOT NULL, price REAL NOT NULL)",
+    "CREATE TABLE inventory (id INTEGER PRIMARY KEY, product_id TEXT NOT NULL, quantity INTEGER NOT NULL)",
+    "CREATE TABLE shipments (id INTEGER PRIMARY KEY, supplier_id INTEGER NOT NULL, customer_id INTEGER NOT NULL, "
+    "product_id TEXT NOT NULL, quantity INTEGER NOT NULL, shipment_date TEXT NOT NULL, "
+    "expected_delivery_date TEXT NOT NULL)",
+)
+
+# Same join as SupplyChainPredictor.load_data (CROSS JOIN keeps transactions as the outer loop)
+JOIN_QUERY = """
+    SELECT transactions.quantity AS trans_quantity, inventory.quantity AS inventory_quantity,
+           suppliers.name AS supplier_name, customers.name AS customer_name,
+           products.product_id, products.name AS product_name, products.description,
+           products.price, shipments.shipment_date, shipments.expected_delivery_date
+    FROM transactions
+    CROSS JOIN suppliers ON transactions.supplier_id = suppliers.id
+    CROSS JOIN customers ON transactions.customer_id = customers.id
+    CROSS JOIN products ON transactions.product_id = products.product_id
+    CROSS JOIN inventory ON transactions.product_id = inventory.product_id
+    CROSS JOIN shipments ON transactions.id = shipments.id
+"""
+
+
+def populate(conn, transactions, products, parties):
+    rng = random.Random(42)
+    product_ids = [f"{i:08d}" for i in range(products)]
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.executemany("INSERT INTO suppliers (name, address) VALUES (?, ?)",
+                     ((f"Supplier {i}", f"{i} Main St") for i in range(parties)))
+    conn.executemany("INSERT INTO customers (name, address) VALUES (?, ?)",
+                     ((f"Customer {i}", f"{i} Elm St") for i in range(parties)))
+    conn.executemany("INSERT INTO products (product_id, name, description, price) VALUES (?, ?, ?, ?)",
+                     ((pid, f"Product {pid}", "desc", rng.uniform(10, 1000)) for pid in product_ids))
+    conn.executemany("INSERT INTO inventory (product_id, quantity) VALUES (?, ?)",
+                     ((pid, rng.randint(1, 100)) for pid in product_ids))
+    rows = [(rng.choice(product_ids), rng.randint(1, parties), rng.randint(1, parties), rng.randint(1, 100))
+            for _ in range(transactions)]
+    conn.executemany(
+        "INSERT INTO transactions (product_id, transaction_detail, supplier_id, customer_id, quantity, shipment_date, "
+        "expected_delivery_date) VALUES (?, 'Purchase', ?, ?, ?, '2024-01-01', '2024-01-10')",
+        ((pid, s, c, q) for pid, s, c, q in rows))
+    conn.executemany(
+        "INSERT INTO shipments (supplier_id, customer_id, product_id, quantity, shipment_date, expected_delivery_date) "
+        "VALUES (?, ?, ?, ?, '2024-01-01', '2024-01-10')",
+        ((s, c, pid, q) for pid, s, c, q in rows))
+    conn.commit()
+    return product_ids
+
+
+def time_join(conn):
+    start = time.perf_counter()
+    count = sum(1 for _ in conn.execute(JOIN_QUERY))
+    return time.perf_counter() - start, count
+
+
+def time_lookups(conn, product_ids, lookups=2000):
+    rng = random.Random(7)
+    sample = [rng.choice(product_ids) for _ in range(lookups)]
+    start = time.perf_counter()
+    for pid in sample:
+        conn.execute("SELECT * FROM products WHERE product_id = ?", (pid,)).fetchall()
+        conn.execute("SELECT * FROM inventory WHERE product_id = ?", (pid,)).fetchall()
+    return time.perf_counter() - start, lookups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the predictor join and by-id lookups before/after indexes")
+    parser.add_argument("--transactions", type=int, default=2_000_000)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--parties", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        print(f"Populating {args.transactions:,} transactions/shipments, {args.products:,} products...")
+        ids = populate(conn, args.transactions, args.products, args.parties)
+
+        join_before, rows = time_join(conn)
+        lookup_before, n = time_lookups(conn, ids)
+        migrate(conn)
+        join_after, _ = time_join(conn)
+        lookup_after, _ = time_lookups(conn, ids)
+        conn.close()
+
+    print(f"Five-way join ({rows:,} rows): before {join_before:.2f}s, after {join_after:.2f}s "
+          f"({join_before / join_after:.1f}x)")
+    print(f"{n:,} product+inventory lookups by product_id: before {lookup_before:.2f}s, after {lookup_after:.3f}s "
+          f"({lookup_before / lookup_after:.0f}x)")
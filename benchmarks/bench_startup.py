@@ -0,0 +1,59 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each scenario runs in a fresh interpreter so nothing is cached between runs
+SCENARIOS = (
+    ("import log_config.logging_config", "import log_config.logging_config"),
+    ("import database.db", "import database.db"),
+    ("import blockchain.blockchain", "import blockchain.blockchain"),
+    ("import machine_learning.supply_chain_ml", "import machine_learning.supply_chain_ml"),
+    ("import app", "import app"),
+    # The whole boot: import plus create_app() where the factory exists
+    ("boot app", "import app\nif hasattr(app, 'create_app'):\n    app.create_app()"),
+)
+
+TIMED = """
+import time
+_start = time.perf_counter()
+{code}
+print(time.perf_counter() - _start)
+"""
+
+
+def run(code, workdir, env):
+    output = subprocess.run(
+        [sys.executable, "-c", TIMED.format(code=code)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time module imports and application boot in fresh interpreters")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "logs"))
+        env = dict(
+            os.environ,
+            PYTHONPATH=ROOT,
+            SQLITE_DB_NAME=os.path.join(workdir, "bench.db"),
+            BLOCKCHAIN_STORAGE_DIR=os.path.join(workdir, "ledger"),
+        )
+        # Boot once so the schema and ledger already exist, as they would for a restarted worker
+        run(SCENARIOS[-1][1], workdir, env)
+        for name, code in SCENARIOS:
+            timings = [run(code, workdir, env) for _ in range(args.runs)]
+            print(f"{name:42s} median {statistics.median(timings) * 1000:8.1f} ms  "
+                  f"min {min(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
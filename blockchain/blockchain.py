@@ -1,51 +1,296 @@
 import hashlib
+import json
+import struct
+import threading
 import time
 
+from blockchain.blockchain_config import BlockchainConfig
+from blockchain.merkle import leaf_hash, merkle_proof, merkle_root
+from blockchain.storage import MemoryBlockStorage, SegmentBlockStorage
+
+
+GENESIS_PREVIOUS_HASH = bytes(32)
+
+# index, timestamp, previous hash, payload length. The header and payload are what gets hashed; the encoded
+# block (used for storage and transport) is header + payload + the 32-byte block hash.
+BLOCK_HEADER = struct.Struct(">QQ32sI")
+HASH_SIZE = 32
+
+
+# Canonical JSON: sorted keys and fixed separators give identical bytes (and hashes) in every process.
+# Built once so every call goes straight to the C encoder without re-validating options.
+_CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+
+
+def encode_data(data):
+    return _CANONICAL_ENCODER.encode(data).encode("ascii")
+
 
 class BlockchainBlock:
-    def __init__(self, index, previous_hash, timestamp, data, block_hash):
+    __slots__ = ("index", "previous_hash", "timestamp", "payload", "block_hash")
+
+    def __init__(self, index, previous_hash, timestamp, payload, block_hash):
         self.index = index
         self.previous_hash = previous_hash
         self.timestamp = timestamp
-        self.data = data
+        self.payload = payload
         self.block_hash = block_hash
 
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+    def header(self):
+        return BLOCK_HEADER.pack(self.index, self.timestamp, self.previous_hash, len(self.payload))
+
+    def encode(self):
+        return self.header() + self.payload + self.block_hash
+
+    @classmethod
+    def decode(cls, buffer):
+        index, timestamp, previous_hash, length = BLOCK_HEADER.unpack_from(buffer)
+        payload_end = BLOCK_HEADER.size + length
+        return cls(
+            index,
+            previous_hash,
+            timestamp,
+            bytes(buffer[BLOCK_HEADER.size:payload_end]),
+            bytes(buffer[payload_end:payload_end + HASH_SIZE]),
+        )
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "data": self.data,
+            "hash": self.block_hash.hex(),
+            "previous_hash": self.previous_hash.hex(),
+        }
+
+
+def encode_block(block):
+    return block.encode()
+
+
+def decode_block(buffer):
+    return BlockchainBlock.decode(buffer)
+
 
 class Blockchain:
-    def __init__(self):
-        self.blockchain = [self.create_genesis_block()]
-        self.last_block = self.blockchain[0]
+    def __init__(self, storage=None, batch_size=1, batch_interval_ms=0):
+        self.blockchain = storage if storage is not None else MemoryBlockStorage()
+        self.batch_size = max(batch_size, 1)
+        self.batch_interval = batch_interval_ms / 1000.0
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._seal_timer = None
+        # hash -> index, built on the first hash lookup and then kept current by add_block
+        self._hash_index = {}
+        self._hash_indexed = 0
+        with self.blockchain.lock():
+            self.blockchain.refresh()
+            if len(self.blockchain) == 0:
+                self.blockchain.append(self.create_genesis_block())
+            self.last_block = self.blockchain[-1]
 
     @staticmethod
-    def calculate_hash(index, previous_hash, timestamp, data):
-        value = str(index) + str(previous_hash) + str(timestamp) + str(data)
-        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+    def calculate_hash(index, previous_hash, timestamp, payload):
+        header = BLOCK_HEADER.pack(index, timestamp, previous_hash, len(payload))
+        return hashlib.sha256(header + payload).digest()
 
     def create_genesis_block(self):
+        timestamp = int(time.time())
+        payload = encode_data("Genesis Block")
         return BlockchainBlock(
             0,
-            "0",
-            int(time.time()),
-            "Genesis Block",
-            self.calculate_hash(0, "0", int(time.time()), "Genesis Block"),
+            GENESIS_PREVIOUS_HASH,
+            timestamp,
+            payload,
+            self.calculate_hash(0, GENESIS_PREVIOUS_HASH, timestamp, payload),
         )
 
     def create_new_block(self, data):
+        return self._create_block(encode_data(data))
+
+    def _create_block(self, payload):
         index = self.last_block.index + 1
         timestamp = int(time.time())
         block_hash = self.calculate_hash(
-            index, self.last_block.block_hash, timestamp, str(data)
+            index, self.last_block.block_hash, timestamp, payload
         )
         return BlockchainBlock(
-            index, self.last_block.block_hash, timestamp, data, block_hash
+            index, self.last_block.block_hash, timestamp, payload, block_hash
         )
 
     def add_block(self, data):
-        new_block = self.create_new_block(data)
-        self.blockchain.append(new_block)
-        self.last_block = new_block
+        return self._append_payload(encode_data(data))
+
+    def _append_payload(self, payload):
+        with self.blockchain.lock():
+            # Another worker process may have appended to the shared ledger since our last write
+            self.blockchain.refresh()
+            if len(self.blockchain) != self.last_block.index + 1:
+                self.last_block = self.blockchain[-1]
+            new_block = self._create_block(payload)
+            self.blockchain.append(new_block)
+            self.last_block = new_block
+            if self._hash_indexed == new_block.index:
+                self._hash_index[new_block.block_hash] = new_block.index
+                self._hash_indexed += 1
         return new_block
 
+    def _index_new_hashes(self):
+        # The hash is the last HASH_SIZE bytes of a block's encoding, so no block is decoded to index it
+        start = self._hash_indexed
+        for index, raw in enumerate(self.blockchain.iter_raw(start, len(self.blockchain)), start):
+            self._hash_index[raw[-HASH_SIZE:]] = index
+        self._hash_indexed = len(self.blockchain)
+
+    def length(self):
+        # Includes blocks appended by other worker processes since our last write
+        with self.blockchain.lock():
+            self.blockchain.refresh()
+        return len(self.blockchain)
+
+    def iter_raw(self, start=0, stop=None):
+        return self.blockchain.iter_raw(start, stop)
+
+    def iter_blocks(self, start=0, stop=None):
+        for raw in self.blockchain.iter_raw(start, stop):
+            yield BlockchainBlock.decode(raw)
+
+    def get_by_index(self, index):
+        if index < 0:
+            return None
+        if index >= len(self.blockchain):
+            # The block may have been appended by another worker process
+            with self.blockchain.lock():
+                self.blockchain.refresh()
+            if index >= len(self.blockchain):
+                return None
+        return self.blockchain[index]
+
+    def get_by_hash(self, block_hash):
+        # Accepts the raw 32-byte digest or its hex form as used by the API
+        if isinstance(block_hash, str):
+            try:
+                block_hash = bytes.fromhex(block_hash)
+            except ValueError:
+                return None
+        index = self._hash_index.get(block_hash)
+        if index is None:
+            with self.blockchain.lock():
+                self.blockchain.refresh()
+                self._index_new_hashes()
+            index = self._hash_index.get(block_hash)
+            if index is None:
+                return None
+        return self.blockchain[index]
+
+    def verify(self, full=False, workers=None):
+        # Imported here because the verification module depends on this module's block format
+        from blockchain.verification import verify_chain
+        return verify_chain(self.blockchain, full=full, workers=workers or BlockchainConfig.VERIFY_WORKERS,
+                            range_size=BlockchainConfig.VERIFY_RANGE_SIZE)
+
+    @property
+    def batching(self):
+        return self.batch_size > 1 or self.batch_interval > 0
+
+    def submit_transaction(self, data):
+        if not self.batching:
+            return self.add_block(data)
+        batch = None
+        with self._pending_lock:
+            self._pending.append(data)
+            if len(self._pending) >= self.batch_size:
+                batch = self._take_pending()
+            elif self._seal_timer is None and self.batch_interval > 0:
+                self._seal_timer = threading.Timer(self.batch_interval, self.flush)
+                self._seal_timer.daemon = True
+                self._seal_timer.start()
+        if batch:
+            return self.seal_transactions(batch)
+        return None
+
+    def _take_pending(self):
+        # Callers hold _pending_lock
+        batch, self._pending = self._pending, []
+        if self._seal_timer is not None:
+            self._seal_timer.cancel()
+            self._seal_timer = None
+        return batch
+
+    def flush(self):
+        with self._pending_lock:
+            batch = self._take_pending()
+        return self.seal_transactions(batch) if batch else None
+
+    @staticmethod
+    def transaction_leaves(transactions):
+        return [leaf_hash(encode_data(transaction)) for transaction in transactions]
+
+    def seal_transactions(self, transactions):
+        # Each transaction is encoded once and the bytes are reused both for its Merkle leaf and, spliced
+        # together, for the block payload; the result is byte-identical to
+        # encode_data({"merkle_root": ..., "transactions": [...]}) since the keys are already in sorted order.
+        encoded = [encode_data(transaction) for transaction in transactions]
+        root = merkle_root([leaf_hash(item) for item in encoded])
+        payload = b'{"merkle_root":"' + root.hex().encode("ascii") + b'","transactions":[' + b",".join(encoded) + b"]}"
+        return self._append_payload(payload)
+
+    def get_merkle_proof(self, block_index, position):
+        block = self.get_by_index(block_index)
+        if block is None:
+            return None
+        data = block.data
+        if not isinstance(data, dict) or "merkle_root" not in data:
+            raise ValueError(f"Block {block_index} is not a sealed transaction batch")
+        transactions = data["transactions"]
+        if not 0 <= position < len(transactions):
+            raise IndexError(f"Block {block_index} has no transaction at position {position}")
+        leaves = self.transaction_leaves(transactions)
+        return {
+            "block_index": block.index,
+            "block_hash": block.block_hash.hex(),
+            "position": position,
+            "transaction": transactions[position],
+            "leaf_hash": leaves[position].hex(),
+            "merkle_root": data["merkle_root"],
+            "proof": [{"hash": sibling.hex(), "side": side} for sibling, side in merkle_proof(leaves, position)],
+        }
+
+    def close(self):
+        self.flush()
+        self.blockchain.close()
+
+
+def create_storage(config=BlockchainConfig):
+    if not config.STORAGE_DIR:
+        return MemoryBlockStorage()
+    return SegmentBlockStorage(
+        config.STORAGE_DIR,
+        encode_block,
+        decode_block,
+        segment_max_bytes=config.SEGMENT_MAX_BYTES,
+        fsync_every=config.FSYNC_EVERY,
+        fsync_interval=config.FSYNC_INTERVAL,
+    )
+
+
+_blockchain = None
+_blockchain_lock = threading.Lock()
 
-blockchain = Blockchain()
 
+def get_blockchain():
+    # Opened on first use so that importing this module does not touch the ledger
+    global _blockchain
+    if _blockchain is None:
+        with _blockchain_lock:
+            if _blockchain is None:
+                _blockchain = Blockchain(
+                    create_storage(),
+                    batch_size=BlockchainConfig.BATCH_SIZE,
+                    batch_interval_ms=BlockchainConfig.BATCH_INTERVAL_MS,
+                )
+    return _blockchain
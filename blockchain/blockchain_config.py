@@ -0,0 +1,20 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class BlockchainConfig:
+    # Directory for the append-only ledger segments; set to an empty string to keep the chain in memory
+    STORAGE_DIR = os.getenv('BLOCKCHAIN_STORAGE_DIR', 'ledger')
+    SEGMENT_MAX_BYTES = int(os.getenv('BLOCKCHAIN_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+    # Appended blocks are fsync'd after this many blocks or this many seconds, whichever comes first
+    FSYNC_EVERY = int(os.getenv('BLOCKCHAIN_FSYNC_EVERY', '100'))
+    FSYNC_INTERVAL = float(os.getenv('BLOCKCHAIN_FSYNC_INTERVAL', '1.0'))
+    # Full audits split the chain into ranges of this many blocks and hash them on a process pool
+    VERIFY_RANGE_SIZE = int(os.getenv('BLOCKCHAIN_VERIFY_RANGE_SIZE', '250000'))
+    VERIFY_WORKERS = int(os.getenv('BLOCKCHAIN_VERIFY_WORKERS', '0')) or None
+    # Batching: transactions are sealed into one Merkle-rooted block every BATCH_SIZE transactions or
+    # BATCH_INTERVAL_MS milliseconds. BATCH_SIZE=1 with no interval keeps one block per transaction.
+    BATCH_SIZE = int(os.getenv('BLOCKCHAIN_BATCH_SIZE', '1'))
+    BATCH_INTERVAL_MS = float(os.getenv('BLOCKCHAIN_BATCH_INTERVAL_MS', '0'))
@@ -0,0 +1,53 @@
+import hashlib
+
+# Leaves and inner nodes are hashed with different prefixes so an inner node can never be passed off
+# as a leaf (second-preimage protection, as in RFC 6962).
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(payload):
+    return hashlib.sha256(_LEAF_PREFIX + payload).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def _next_level(level):
+    # An unpaired last node is promoted unchanged rather than hashed with itself, so [a, b, c] and
+    # [a, b, c, c] cannot produce the same root
+    paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        paired.append(level[-1])
+    return paired
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return bytes(32)
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(leaves, position):
+    if not 0 <= position < len(leaves):
+        raise IndexError("leaf position out of range")
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append((level[sibling], "left" if sibling < position else "right"))
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    current = leaf
+    for sibling, side in proof:
+        current = node_hash(sibling, current) if side == "left" else node_hash(current, sibling)
+    return current == root
@@ -0,0 +1,381 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; the storage is then only safe for a single process
+    fcntl = None
+
+# Bumped whenever the record payload format changes; older segments are refused rather than misread
+SEGMENT_MAGIC = b"PSCLEDG2"
+RECORD_HEADER = struct.Struct(">I")
+INDEX_ENTRY = struct.Struct(">Q")
+
+
+class StorageError(Exception):
+    pass
+
+
+class MemoryBlockStorage:
+    def __init__(self):
+        self._blocks = []
+        self._lock = threading.RLock()
+        self._checkpoint = None
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __getitem__(self, index):
+        return self._blocks[index]
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def read_raw(self, index):
+        return self._blocks[index].encode()
+
+    def iter_raw(self, start=0, stop=None):
+        for block in self._blocks[start:stop]:
+            yield block.encode()
+
+    def append(self, block):
+        self._blocks.append(block)
+
+    def load_checkpoint(self):
+        return self._checkpoint
+
+    def save_checkpoint(self, index, block_hash):
+        self._checkpoint = (index, block_hash)
+
+    @contextmanager
+    def lock(self):
+        with self._lock:
+            yield
+
+    def refresh(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Segment:
+    def __init__(self, number, data_path, index_path, first_index):
+        self.number = number
+        self.data_path = data_path
+        self.index_path = index_path
+        self.first_index = first_index
+        self.count = 0
+        self._data_map = None
+        self._index_map = None
+
+    def _map(self, path, current):
+        # Segments only ever grow, so a mapping is reused until a read falls past its end
+        size = os.path.getsize(path)
+        if current is not None and len(current) == size:
+            return current
+        # The previous map is not closed here: a concurrent reader may still be iterating over it,
+        # and it is released once the last reference goes away
+        if size == 0:
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def offset(self, position):
+        start = position * INDEX_ENTRY.size
+        if self._index_map is None or len(self._index_map) < start + INDEX_ENTRY.size:
+            self._index_map = self._map(self.index_path, self._index_map)
+        return INDEX_ENTRY.unpack_from(self._index_map, start)[0]
+
+    def read(self, position):
+        offset = self.offset(position)
+        if self._data_map is None or len(self._data_map) < offset + RECORD_HEADER.size:
+            self._data_map = self._map(self.data_path, self._data_map)
+        (length,) = RECORD_HEADER.unpack_from(self._data_map, offset)
+        start = offset + RECORD_HEADER.size
+        if len(self._data_map) < start + length:
+            self._data_map = self._map(self.data_path, self._data_map)
+        return self._data_map[start:start + length]
+
+    def iter_raw(self, start, stop):
+        # Sequential scan for bulk readers: one index slice and no per-record bounds checks or remaps
+        if start >= stop:
+            return
+        self.read(stop - 1)  # makes sure both maps cover the whole range
+        data = self._data_map
+        unpack_length = RECORD_HEADER.unpack_from
+        header_size = RECORD_HEADER.size
+        for (offset,) in INDEX_ENTRY.iter_unpack(self._index_map[start * INDEX_ENTRY.size:stop * INDEX_ENTRY.size]):
+            (length,) = unpack_length(data, offset)
+            yield data[offset + header_size:offset + header_size + length]
+
+    def close(self):
+        for mapped in (self._data_map, self._index_map):
+            if mapped is not None:
+                mapped.close()
+        self._data_map = None
+        self._index_map = None
+
+
+# Append-only, length-prefixed block log split into segment files. Each segment-NNNNNN.log holds
+# [u32 length][payload] records after a magic header and the sidecar segment-NNNNNN.idx holds one u64
+# file offset per record. Opening the storage memory-maps the index files and only validates the tail
+# of the newest segment, so startup cost does not grow with the chain. Blocks are decoded on access.
+class SegmentBlockStorage:
+
+    def __init__(self, directory, encode, decode, segment_max_bytes=64 * 1024 * 1024, fsync_every=100,
+                 fsync_interval=1.0, read_only=False):
+        self.directory = directory
+        self.encode = encode
+        self.decode = decode
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._segments = []
+        self._firsts = []
+        self._data_file = None
+        self._index_file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._thread_lock = threading.RLock()
+        self.read_only = read_only
+        self._lock_file = None
+        if read_only:
+            # Readers (e.g. verification workers) only see what the writers have fully indexed
+            self._discover()
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "LOCK"), "a+b")
+        with self.lock():
+            self._discover()
+            if self._segments:
+                self._recover_tail(self._segments[-1])
+
+    def _segment_paths(self, number):
+        stem = os.path.join(self.directory, f"segment-{number:06d}")
+        return stem + ".log", stem + ".idx"
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                numbers.append(int(name[len("segment-"):-len(".log")]))
+        return sorted(numbers)
+
+    def _add_segment(self, number):
+        first_index = self._segments[-1].first_index + self._segments[-1].count if self._segments else 0
+        segment = _Segment(number, *self._segment_paths(number), first_index)
+        self._segments.append(segment)
+        self._firsts.append(first_index)
+        return segment
+
+    @staticmethod
+    def _indexed_count(segment):
+        if not os.path.exists(segment.index_path):
+            return 0
+        return os.path.getsize(segment.index_path) // INDEX_ENTRY.size
+
+    def _discover(self):
+        if self._segments:
+            self._segments[-1].count = self._indexed_count(self._segments[-1])
+        for number in self._segment_numbers()[len(self._segments):]:
+            segment = self._add_segment(number)
+            segment.count = self._indexed_count(segment)
+
+    def _recover_tail(self, segment):
+        # Only the newest segment can be incomplete: drop a torn index entry or record and index any
+        # records that were written but whose index entries did not make it to disk before a crash.
+        data_size = os.path.getsize(segment.data_path)
+        with open(segment.data_path, "r+b") as data:
+            if data_size < len(SEGMENT_MAGIC):
+                data.truncate(0)
+                data.write(SEGMENT_MAGIC)
+                data_size = len(SEGMENT_MAGIC)
+            elif data.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+                raise StorageError(f"{segment.data_path} is not a ledger segment or uses an unsupported format")
+
+            with open(segment.index_path, "a+b") as index:
+                index_size = os.path.getsize(segment.index_path)
+                count = index_size // INDEX_ENTRY.size
+                offsets = []
+                end = len(SEGMENT_MAGIC)
+                while count:
+                    # Index pages may reach the disk before data pages, so walk back past any entry
+                    # that points at a record which is not fully on disk
+                    index.seek((count - 1) * INDEX_ENTRY.size)
+                    (last_offset,) = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                    data.seek(last_offset)
+                    header = data.read(RECORD_HEADER.size)
+                    if len(header) == RECORD_HEADER.size:
+                        record_end = last_offset + RECORD_HEADER.size + RECORD_HEADER.unpack(header)[0]
+                        if record_end <= data_size:
+                            end = record_end
+                            break
+                    count -= 1
+                data.seek(end)
+                while end + RECORD_HEADER.size <= data_size:
+                    (length,) = RECORD_HEADER.unpack(data.read(RECORD_HEADER.size))
+                    if end + RECORD_HEADER.size + length > data_size:
+                        break
+                    offsets.append(end)
+                    end += RECORD_HEADER.size + length
+                    data.seek(end)
+                index.truncate(count * INDEX_ENTRY.size)
+                index.seek(0, os.SEEK_END)
+                for offset in offsets:
+                    index.write(INDEX_ENTRY.pack(offset))
+                index.flush()
+                os.fsync(index.fileno())
+            if end < data_size:
+                data.truncate(end)
+            data.flush()
+            os.fsync(data.fileno())
+        segment.count = count + len(offsets)
+
+    def _open_for_append(self):
+        if not self._segments:
+            segment = self._add_segment(0)
+            with open(segment.data_path, "wb") as data:
+                data.write(SEGMENT_MAGIC)
+            open(segment.index_path, "wb").close()
+        segment = self._segments[-1]
+        if self._data_file is None or self._data_file.name != segment.data_path:
+            self._close_files()
+            self._data_file = open(segment.data_path, "ab")
+            self._index_file = open(segment.index_path, "ab")
+        return segment
+
+    def _roll_segment(self):
+        self.sync()
+        self._close_files()
+        segment = self._add_segment(self._segments[-1].number + 1)
+        with open(segment.data_path, "wb") as data:
+            data.write(SEGMENT_MAGIC)
+        open(segment.index_path, "wb").close()
+
+    def _close_files(self):
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                f.close()
+        self._data_file = None
+        self._index_file = None
+
+    def __len__(self):
+        if not self._segments:
+            return 0
+        return self._segments[-1].first_index + self._segments[-1].count
+
+    def _locate(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("block index out of range")
+        segment = self._segments[bisect_right(self._firsts, index) - 1]
+        return segment, index - segment.first_index
+
+    def read_raw(self, index):
+        segment, position = self._locate(index)
+        return segment.read(position)
+
+    def __getitem__(self, index):
+        return self.decode(self.read_raw(index))
+
+    def iter_raw(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        while start < stop:
+            segment, position = self._locate(start)
+            end = min(stop, segment.first_index + segment.count)
+            yield from segment.iter_raw(position, end - segment.first_index)
+            start = end
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, block):
+        if self.read_only:
+            raise StorageError("The ledger storage was opened read-only")
+        payload = self.encode(block)
+        segment = self._open_for_append()
+        # Other processes append to the same file, so the handle's own position cannot be trusted
+        offset = os.fstat(self._data_file.fileno()).st_size
+        if offset > len(SEGMENT_MAGIC) and offset + RECORD_HEADER.size + len(payload) > self.segment_max_bytes:
+            self._roll_segment()
+            segment = self._open_for_append()
+            offset = os.fstat(self._data_file.fileno()).st_size
+        # Data is written before its index entry, so a crash can only leave an unindexed tail record
+        self._data_file.write(RECORD_HEADER.pack(len(payload)) + payload)
+        self._data_file.flush()
+        self._index_file.write(INDEX_ENTRY.pack(offset))
+        self._index_file.flush()
+        segment.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._data_file is not None:
+            os.fsync(self._data_file.fileno())
+            os.fsync(self._index_file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.directory, "verify.checkpoint")
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        if len(raw) != INDEX_ENTRY.size + 32:
+            return None
+        return INDEX_ENTRY.unpack_from(raw)[0], raw[INDEX_ENTRY.size:]
+
+    def save_checkpoint(self, index, block_hash):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_ENTRY.pack(index) + block_hash)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    @contextmanager
+    def lock(self):
+        # Serializes appends between threads and, via flock, between worker processes sharing the directory
+        with self._thread_lock:
+            if fcntl is not None and self._lock_file is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self):
+        # Picks up blocks appended by other processes since the last look; callers hold lock()
+        self._discover()
+
+    def flush(self):
+        with self._thread_lock:
+            self.sync()
+
+    def close(self):
+        with self._thread_lock:
+            self.sync()
+            self._close_files()
+            for segment in self._segments:
+                segment.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
@@ -0,0 +1,96 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from blockchain.blockchain import BLOCK_HEADER, GENESIS_PREVIOUS_HASH, HASH_SIZE
+from blockchain.storage import SegmentBlockStorage
+
+# Field offsets inside an encoded block (see BLOCK_HEADER): index u64, timestamp u64, previous hash
+_INDEX_END = 8
+_PREVIOUS_HASH_START = 16
+_PREVIOUS_HASH_END = _PREVIOUS_HASH_START + HASH_SIZE
+
+# Workers are started from a fresh server process rather than forked from the (threaded) app, so they never
+# inherit locks held by its other threads; they only map the ledger, so they need nothing from the parent.
+# Windows has no forkserver and spawns instead.
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def verify_records(records, start, previous_hash):
+    # Works on encoded blocks directly: no block objects are built and the payload is never parsed.
+    # Returns (index, reason) for the first broken block, or None.
+    sha256 = hashlib.sha256
+    index = start
+    for raw in records:
+        if int.from_bytes(raw[:_INDEX_END], "big") != index:
+            return index, "block index does not match its position in the chain"
+        if raw[_PREVIOUS_HASH_START:_PREVIOUS_HASH_END] != previous_hash:
+            return index, "previous_hash does not match the preceding block"
+        block_hash = raw[-HASH_SIZE:]
+        if len(raw) < BLOCK_HEADER.size + HASH_SIZE or sha256(raw[:-HASH_SIZE]).digest() != block_hash:
+            return index, "block hash does not match its contents"
+        previous_hash = block_hash
+        index += 1
+    return None
+
+
+def _previous_hash(read_raw, start):
+    return read_raw(start - 1)[-HASH_SIZE:] if start else GENESIS_PREVIOUS_HASH
+
+
+def _verify_segment_range(directory, start, stop):
+    # Runs in a pool worker: each worker maps the ledger itself instead of receiving pickled blocks
+    storage = SegmentBlockStorage(directory, None, None, read_only=True)
+    try:
+        return verify_records(storage.iter_raw(start, stop), start, _previous_hash(storage.read_raw, start))
+    finally:
+        storage.close()
+
+
+def verify_chain(storage, full=False, workers=None, range_size=250_000):
+    started = time.perf_counter()
+    with storage.lock():
+        storage.refresh()
+        length = len(storage)
+
+    start = 0
+    checkpoint = None if full else storage.load_checkpoint()
+    if checkpoint is not None:
+        checkpoint_index, checkpoint_hash = checkpoint
+        if checkpoint_index >= length or storage.read_raw(checkpoint_index)[-HASH_SIZE:] != checkpoint_hash:
+            return _result(False, "incremental", checkpoint_index, length, started,
+                           (checkpoint_index, "block changed since it was last verified"))
+        start = checkpoint_index + 1
+
+    ranges = [(s, min(s + range_size, length)) for s in range(start, length, range_size)]
+    workers = workers or os.cpu_count() or 1
+    if isinstance(storage, SegmentBlockStorage) and workers > 1 and len(ranges) > 1:
+        storage.flush()
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                 mp_context=multiprocessing.get_context(_POOL_START_METHOD)) as pool:
+            errors = list(pool.map(_verify_segment_range, [storage.directory] * len(ranges),
+                                   *zip(*ranges)))
+    else:
+        errors = [verify_records(storage.iter_raw(s, e), s, _previous_hash(storage.read_raw, s))
+                  for s, e in ranges]
+
+    errors = [error for error in errors if error is not None]
+    if errors:
+        return _result(False, "full" if full else "incremental", start, length, started, min(errors))
+    if length:
+        storage.save_checkpoint(length - 1, storage.read_raw(length - 1)[-HASH_SIZE:])
+    return _result(True, "full" if full or checkpoint is None else "incremental", start, length, started, None)
+
+
+def _result(valid, mode, start, length, started, error):
+    return {
+        "valid": valid,
+        "mode": mode,
+        "from_index": start,
+        "to_index": length - 1,
+        "checked": max(length - start, 0),
+        "seconds": round(time.perf_counter() - started, 6),
+        "error": None if error is None else {"index": error[0], "reason": error[1]},
+    }
@@ -1,122 +1,241 @@
+import hashlib
 import logging
 import sqlite3
+import threading
+from itertools import islice
+from operator import itemgetter
 
+from database.db_cache import ReadCache
 from database.db_config import DatabaseConfig
-from log_config.logging_config import LoggingConfig
+from database.db_migrations import get_schema_version, migrate
+from database.db_pool import ConnectionPool
+from database.db_stock_levels import (
+    STOCK_LEVEL_COLUMNS,
+    STOCK_LEVEL_QUERY,
+    add_stock_movements,
+    rebuild_stock_levels,
+)
+from database.db_writer import SQLiteWriter
+
+_MISS = object()
+
+
+# Tables created by create_database(); indexes and later additions are schema migrations (db_migrations.py)
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY,
+        product_id TEXT NOT NULL,
+        transaction_detail TEXT NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        customer_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        shipment_date TEXT NOT NULL,
+        expected_delivery_date TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS suppliers (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        address TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        address TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY,
+        product_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL,
+        price REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inventory (
+        id INTEGER PRIMARY KEY,
+        product_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS shipments (
+        id INTEGER PRIMARY KEY,
+        supplier_id INTEGER NOT NULL,
+        customer_id INTEGER NOT NULL,
+        product_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        shipment_date TEXT NOT NULL,
+        expected_delivery_date TEXT NOT NULL
+    )
+    """,
+)
+
+
+def _row_weight(value):
+    return max(len(value), 1) if isinstance(value, list) else 1
+
+
+def _page_etag(rows):
+    # Rows are tuples of str/int/float, whose repr is stable, so this identifies the page's content
+    return hashlib.blake2b(repr(rows).encode(), digest_size=16).hexdigest()
 
 
 class SupplyChainDatabase:
+    TRANSACTION_COLUMNS = ("product_id", "transaction_detail", "supplier_id", "customer_id", "quantity",
+                           "shipment_date", "expected_delivery_date")
+    SUPPLIER_COLUMNS = ("name", "address")
+    CUSTOMER_COLUMNS = ("name", "address")
+    PRODUCT_COLUMNS = ("product_id", "name", "description", "price")
+    INVENTORY_COLUMNS = ("product_id", "quantity")
+    SHIPMENT_COLUMNS = ("supplier_id", "customer_id", "product_id", "quantity", "shipment_date",
+                        "expected_delivery_date")
+
     def __init__(self):
         self.db_config = DatabaseConfig()
         self.db_name = self.db_config.DB_CONFIG[self.db_config.DB_TYPE]
-        self.logging_config = LoggingConfig()
-        self.logging_config.configure_logger()
-        self.logging_config.configure_eliot()
-        self.spinner = self.logging_config.initialize_spinner()
+        self.production_mode = self.db_config.DB_STORAGE_MODE == 'production'
+        self.pool = ConnectionPool(
+            self.db_name,
+            size=self.db_config.DB_POOL_SIZE,
+            timeout=self.db_config.DB_POOL_TIMEOUT,
+            health_check=self.db_config.DB_POOL_HEALTH_CHECK,
+            pragmas=self._connection_pragmas(),
+        )
+        self.read_cache = None
+        if self.db_config.DB_READ_CACHE_MAX_ROWS > 0:
+            self.read_cache = ReadCache(self.db_config.DB_READ_CACHE_MAX_ROWS, self.db_config.DB_READ_CACHE_TTL)
+        self.writer = None
+        if self.production_mode:
+            self.enable_wal()
+            self.writer = SQLiteWriter(
+                self.pool.connect,
+                batch_size=self.db_config.DB_WRITER_BATCH_SIZE,
+                max_delay=self.db_config.DB_WRITER_MAX_DELAY_MS / 1000.0,
+            )
 
-    def _execute_query(self, query, params=None):
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-
-        # Check if the tables already exist
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='transactions'")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='suppliers'")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='customers'")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='products'")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inventory'")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='shipments'")
-        if cursor.fetchone():
-            print("Database is already set up.")
+    def _connection_pragmas(self):
+        pragmas = {"busy_timeout": self.db_config.DB_BUSY_TIMEOUT_MS}
+        if self.production_mode:
+            pragmas.update({
+                "synchronous": self.db_config.DB_SYNCHRONOUS,
+                # A negative cache_size is interpreted by SQLite as KiB rather than pages
+                "cache_size": -self.db_config.DB_CACHE_SIZE_KB,
+                "mmap_size": self.db_config.DB_MMAP_SIZE,
+                "temp_store": "MEMORY",
+            })
+        return pragmas
+
+    def enable_wal(self):
+        # journal_mode is persistent in the database file, so this only needs to run once per process
+        with self.pool.connection() as connection:
+            mode = connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if mode.lower() != 'wal':
+            raise sqlite3.OperationalError(f"Could not switch {self.db_name} to WAL (journal_mode={mode})")
+
+    def _write(self, operation):
+        # operation receives a cursor and returns the value handed back to the caller
+        if self.writer is not None:
+            return self.writer.submit(operation)
+        with self.pool.connection() as connection:
+            try:
+                # Take the write lock up front so reads inside the operation see a stable table
+                connection.execute("BEGIN IMMEDIATE")
+                result = operation(connection.cursor())
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return result
+
+    def get_pool_stats(self):
+        return self.pool.stats()
+
+    def get_writer_stats(self):
+        return self.writer.stats() if self.writer is not None else None
+
+    def get_cache_stats(self):
+        return self.read_cache.stats() if self.read_cache is not None else None
+
+    def _cached_read(self, tag, key, load, weight=_row_weight):
+        if self.read_cache is None:
+            return load()
+        value = self.read_cache.get(key, _MISS)
+        if value is _MISS:
+            generation = self.read_cache.generation(tag)
+            value = load()
+            self.read_cache.put(key, value, tag, generation, weight(value))
+        return value
+
+    def _invalidate_after_insert(self, tag, row_id, key=None):
+        # A new row has the highest id, so it can only change the lookup for its own key, whole-table reads
+        # and pages that were not full and start before it; full pages and other keys stay cached. Keys start
+        # with the table name (the cache is shared by every table), followed by the kind of read.
+        if self.read_cache is None:
             return
 
-        try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            connection.commit()
-        except sqlite3.Error:
-            logging.basicConfig(filename='logs/python_logger.log', level=logging.INFO)
-        finally:
-            connection.close()
+        def affected(cached_key, value):
+            if cached_key[1] == "page":
+                after_id, limit = cached_key[2:]
+                return after_id < row_id and len(value[0]) < limit
+            return cached_key[1] == "all" or cached_key == key
+
+        self.read_cache.invalidate(tag, affected)
+
+    def get_schema_version(self):
+        with self.pool.connection() as connection:
+            return get_schema_version(connection)
+
+    def optimize(self):
+        # Lets SQLite refresh planner statistics for indexes whose tables changed significantly
+        with self.pool.connection() as connection:
+            connection.execute("PRAGMA optimize")
+
+    def close(self):
+        self.optimize()
+        if self.writer is not None:
+            self.writer.close()
+        self.pool.close()
+
+    def _execute_query(self, query, params=None):
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+
+            # Check if the tables already exist
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='transactions'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='suppliers'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='customers'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='products'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inventory'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='shipments'")
+            if cursor.fetchone():
+                print("Database is already set up.")
+                return
+
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                connection.commit()
+            except sqlite3.Error:
+                logging.basicConfig(filename='logs/python_logger.log', level=logging.INFO)
 
     def create_database(self):
-        connection = None
         try:
-            self.spinner.start("Creating database...")
-            connection = sqlite3.connect(self.db_name)
-            cursor = connection.cursor()
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY,
-                    product_id TEXT NOT NULL,
-                    transaction_detail TEXT NOT NULL,
-                    supplier_id INTEGER NOT NULL,
-                    customer_id INTEGER NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    shipment_date TEXT NOT NULL,
-                    expected_delivery_date TEXT NOT NULL
-                )
-            """
-            )
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS suppliers (
-                    id INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    address TEXT NOT NULL
-                )
-            """
-            )
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    address TEXT NOT NULL
-                )
-            """
-            )
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY,
-                    product_id TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    price REAL NOT NULL
-                )
-            """
-            )
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS inventory (
-                    id INTEGER PRIMARY KEY,
-                    product_id TEXT NOT NULL,
-                    quantity INTEGER NOT NULL
-                )
-            """
-            )
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS shipments (
-                    id INTEGER PRIMARY KEY,
-                    supplier_id INTEGER NOT NULL,
-                    customer_id INTEGER NOT NULL,
-                    product_id TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    shipment_date TEXT NOT NULL,
-                    expected_delivery_date TEXT NOT NULL
-                )
-            """
-            )
-            self.spinner.succeed("Database created successfully.")
+            with self.pool.connection() as connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                migrate(connection)
+            logging.info("Database schema is up to date (version %s).", self.get_schema_version())
         except sqlite3.Error as e:
             print("Error creating database:", e)
-        finally:
-            if connection:
-                connection.close()
 
     def insert_transaction(self, transaction):
         query = """
@@ -124,20 +243,22 @@ class SupplyChainDatabase:
             expected_delivery_date)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute(query, (
-            transaction["product_id"],
-            transaction["transaction_detail"],
-            transaction["supplier_id"],
-            transaction["customer_id"],
-            transaction["quantity"],
-            transaction["shipment_date"],
-            transaction["expected_delivery_date"],
-        ))
-        transaction_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+
+        def operation(cursor):
+            row_id = cursor.execute(query, (
+                transaction["product_id"],
+                transaction["transaction_detail"],
+                transaction["supplier_id"],
+                transaction["customer_id"],
+                transaction["quantity"],
+                transaction["shipment_date"],
+                transaction["expected_delivery_date"],
+            )).lastrowid
+            # Same transaction as the row itself, so the totals can never disagree with the table
+            add_stock_movements(cursor, "transactions", ((transaction["product_id"], transaction["quantity"]),))
+            return row_id
+
+        transaction_id = self._write(operation)
         transaction['id'] = transaction_id
         return transaction
 
@@ -145,12 +266,10 @@ class SupplyChainDatabase:
         query = """
             INSERT INTO suppliers (name, address) VALUES (?, ?)
         """
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute(query, (supplier["name"], supplier["address"]))
-        supplier_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+        supplier_id = self._write(lambda cursor: cursor.execute(query, (
+            supplier["name"],
+            supplier["address"],
+        )).lastrowid)
         supplier['id'] = supplier_id
         return supplier
 
@@ -158,12 +277,10 @@ class SupplyChainDatabase:
         query = """
             INSERT INTO customers (name, address) VALUES (?, ?)
         """
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute(query, (customer["name"], customer["address"]))
-        customer_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+        customer_id = self._write(lambda cursor: cursor.execute(query, (
+            customer["name"],
+            customer["address"],
+        )).lastrowid)
         customer['id'] = customer_id
         return customer
 
@@ -172,18 +289,14 @@ class SupplyChainDatabase:
             INSERT INTO products (product_id, name, description, price)
             VALUES (?, ?, ?, ?)
         """
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute(query, (
+        product_id = self._write(lambda cursor: cursor.execute(query, (
             product["product_id"],
             product["name"],
             product["description"],
             product["price"],
-        ))
-        product_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+        )).lastrowid)
         product['id'] = product_id
+        self._invalidate_after_insert("products", product_id, ("products", "id", product_id))
         return product
 
     def insert_inventory(self, inventory):
@@ -191,16 +304,19 @@ class SupplyChainDatabase:
          INSERT INTO inventory (product_id, quantity)
          VALUES (?, ?)
         """
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute(query, (
-            inventory["product_id"],
-            inventory["quantity"],
-        ))
-        inventory_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+
+        def operation(cursor):
+            row_id = cursor.execute(query, (
+                inventory["product_id"],
+                inventory["quantity"],
+            )).lastrowid
+            # Same transaction as the row itself, so the totals can never disagree with the table
+            add_stock_movements(cursor, "inventory", ((inventory["product_id"], inventory["quantity"]),))
+            return row_id
+
+        inventory_id = self._write(operation)
         inventory['id'] = inventory_id
+        self._invalidate_after_insert("inventory", inventory_id, ("inventory", "product_id", inventory["product_id"]))
         return inventory
 
     def insert_shipment(self, shipment):
@@ -209,49 +325,184 @@ class SupplyChainDatabase:
             shipment_date, expected_delivery_date)
             VALUES (?, ?, ?, ?, ?, ?)
         """
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute(query, (
-            shipment["supplier_id"],
-            shipment["customer_id"],
-            shipment["product_id"],
-            shipment["quantity"],
-            shipment["shipment_date"],
-            shipment["expected_delivery_date"],
-        ))
-        shipment_id = cursor.lastrowid
-        connection.commit()
-        connection.close()
+
+        def operation(cursor):
+            row_id = cursor.execute(query, (
+                shipment["supplier_id"],
+                shipment["customer_id"],
+                shipment["product_id"],
+                shipment["quantity"],
+                shipment["shipment_date"],
+                shipment["expected_delivery_date"],
+            )).lastrowid
+            # Same transaction as the row itself, so the totals can never disagree with the table
+            add_stock_movements(cursor, "shipments", ((shipment["product_id"], shipment["quantity"]),))
+            return row_id
+
+        shipment_id = self._write(operation)
         shipment['id'] = shipment_id
         return shipment
 
+    def _insert_bulk(self, table, columns, rows, chunk_size=None, track_stock=False):
+        chunk_size = chunk_size or self.db_config.DB_BULK_CHUNK_SIZE
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        get_values = itemgetter(*columns) if len(columns) > 1 else lambda row: (row[columns[0]],)
+        get_movement = itemgetter(columns.index("product_id"), columns.index("quantity")) if track_stock else None
+
+        def operation(cursor):
+            # The whole load runs in one write transaction, so rowids are handed out contiguously
+            # after the current maximum and do not need to be read back row by row.
+            first_id = cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0] + 1
+            count = 0
+            rows_iter = iter(rows)
+            while True:
+                chunk = [get_values(row) for row in islice(rows_iter, chunk_size)]
+                if not chunk:
+                    break
+                cursor.executemany(query, chunk)
+                if get_movement is not None:
+                    add_stock_movements(cursor, table, map(get_movement, chunk))
+                count += len(chunk)
+            last_id = cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            if count and last_id != first_id + count - 1:
+                raise sqlite3.IntegrityError(f"Bulk insert into {table} received non-contiguous ids")
+            return range(first_id, first_id + count)
+
+        return self._write(operation)
+
+    def insert_transactions_bulk(self, transactions, chunk_size=None):
+        return self._insert_bulk("transactions", self.TRANSACTION_COLUMNS, transactions, chunk_size, track_stock=True)
+
+    def insert_suppliers_bulk(self, suppliers, chunk_size=None):
+        return self._insert_bulk("suppliers", self.SUPPLIER_COLUMNS, suppliers, chunk_size)
+
+    def insert_customers_bulk(self, customers, chunk_size=None):
+        return self._insert_bulk("customers", self.CUSTOMER_COLUMNS, customers, chunk_size)
+
+    def insert_products_bulk(self, products, chunk_size=None):
+        ids = self._insert_bulk("products", self.PRODUCT_COLUMNS, products, chunk_size)
+        if self.read_cache is not None:
+            self.read_cache.invalidate("products")
+        return ids
+
+    def insert_inventory_bulk(self, inventory, chunk_size=None):
+        ids = self._insert_bulk("inventory", self.INVENTORY_COLUMNS, inventory, chunk_size, track_stock=True)
+        if self.read_cache is not None:
+            self.read_cache.invalidate("inventory")
+        return ids
+
+    def insert_shipments_bulk(self, shipments, chunk_size=None):
+        return self._insert_bulk("shipments", self.SHIPMENT_COLUMNS, shipments, chunk_size, track_stock=True)
+
     def get_transaction_by_id(self, transaction_id):
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
-        transaction = cursor.fetchone()
-        connection.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
+            transaction = cursor.fetchone()
         return transaction
 
+    def _fetch_all(self, query, params=()):
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def get_product_by_id(self, product_id):
+        def load():
+            rows = self._fetch_all("SELECT * FROM products WHERE id = ?", (product_id,))
+            return rows[0] if rows else None
+
+        return self._cached_read("products", ("products", "id", product_id), load)
+
+    def get_inventory_by_product_id(self, product_id):
+        def load():
+            rows = self._fetch_all("SELECT * FROM inventory WHERE product_id = ? ORDER BY id", (product_id,))
+            return rows or None
+
+        return self._cached_read("inventory", ("inventory", "product_id", product_id), load)
+
+    def get_stock_level(self, product_id):
+        # A primary-key lookup on stock_levels, which the inventory, transaction and shipment inserts keep current
+        # by upserting into it in the same write transaction
+        rows = self._fetch_all(STOCK_LEVEL_QUERY, (product_id,))
+        return dict(zip(STOCK_LEVEL_COLUMNS, rows[0])) if rows else None
+
+    def rebuild_stock_levels(self, chunk_size=50000):
+        return self._write(lambda cursor: rebuild_stock_levels(cursor, chunk_size))
+
     def get_inventory(self):
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM inventory")
-        inventory = cursor.fetchall()
-        connection.close()
-        return inventory
+        return self._cached_read("inventory", ("inventory", "all"), lambda: self._fetch_all("SELECT * FROM inventory"))
 
     def get_all_products(self):
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM products")
-        products = cursor.fetchall()
-        connection.close()
-        return products
+        return self._cached_read("products", ("products", "all"), lambda: self._fetch_all("SELECT * FROM products"))
+
+    def get_all_transactions(self):
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT * FROM transactions")
+            transactions = cursor.fetchall()
+        return transactions
+
+    def _get_page(self, table, after_id=0, limit=100):
+        # Keyset pagination: seeks straight to after_id on the rowid instead of skipping OFFSET rows
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+            return cursor.fetchall()
+
+    def _iter_chunks(self, table, after_id=0, chunk_size=1000):
+        # Each chunk is read on its own short pool checkout, so a slow streaming client never pins a connection
+        while True:
+            rows = self._get_page(table, after_id, chunk_size)
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+
+    def _get_cached_page(self, table, after_id, limit):
+        def load():
+            rows = self._get_page(table, after_id, limit)
+            return rows, _page_etag(rows)
+
+        # Cached as (rows, etag) so that an unchanged page costs neither a query nor a re-hash
+        return self._cached_read(table, (table, "page", after_id, limit), load, lambda page: _row_weight(page[0]))
+
+    def get_products_page(self, after_id=0, limit=100):
+        return self._get_cached_page("products", after_id, limit)[0]
+
+    def get_inventory_page(self, after_id=0, limit=100):
+        return self._get_cached_page("inventory", after_id, limit)[0]
+
+    def get_products_page_with_etag(self, after_id=0, limit=100):
+        return self._get_cached_page("products", after_id, limit)
+
+    def get_inventory_page_with_etag(self, after_id=0, limit=100):
+        return self._get_cached_page("inventory", after_id, limit)
+
+    def get_transactions_page(self, after_id=0, limit=100):
+        return self._get_page("transactions", after_id, limit)
+
+    def iter_products(self, after_id=0, chunk_size=1000):
+        return self._iter_chunks("products", after_id, chunk_size)
+
+    def iter_inventory(self, after_id=0, chunk_size=1000):
+        return self._iter_chunks("inventory", after_id, chunk_size)
+
+    def iter_transactions(self, after_id=0, chunk_size=1000):
+        return self._iter_chunks("transactions", after_id, chunk_size)
+
 
+_database = None
+_database_lock = threading.Lock()
 
-# Initialize the database object
-db = SupplyChainDatabase()
 
-# Call the function to create the database
-db.create_database()
+def get_database():
+    # The shared database object is built, and its schema created, on first use rather than at import time
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                database = SupplyChainDatabase()
+                database.create_database()
+                _database = database
+    return _database
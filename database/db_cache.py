@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReadCache:
+    # LRU cache with a TTL for query results. Each entry belongs to a tag (its table) and has a weight (its
+    # row count); the total weight is capped at max_rows, so memory stays bounded even for whole-table reads.
+    #
+    # Every invalidation bumps the tag's generation. A reader takes the generation before querying and the
+    # result is only stored if it is unchanged, so a read that raced with a write cannot re-insert the stale
+    # rows after the write invalidated them. The TTL bounds staleness for writes made by other processes.
+    def __init__(self, max_rows=100000, ttl=60.0):
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._generations = {}
+        self._weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, _, _ = entry
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value, tag, generation, weight=1):
+        with self._lock:
+            if generation != self._generations.get(tag, 0) or weight > self.max_rows:
+                self.rejected += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, weight, tag)
+            self._tags.setdefault(tag, set()).add(key)
+            self._weight += weight
+            while self._weight > self.max_rows:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def _remove(self, key):
+        # Callers hold _lock
+        _, _, weight, tag = self._entries.pop(key)
+        self._tags[tag].discard(key)
+        self._weight -= weight
+
+    def invalidate(self, tag, predicate=None):
+        # Drops the tag's entries whose key and value match predicate (all of them by default)
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tags.get(tag, ())):
+                if predicate is None or predicate(key, self._entries[key][0]):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for tag in list(self._tags):
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._entries.clear()
+            self._tags.clear()
+            self._weight = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._weight,
+                "max_rows": self.max_rows,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected,
+            }
@@ -37,3 +37,26 @@ class DatabaseConfig:
         }
     }
     DB_TYPE = os.getenv('DB_TYPE', 'sqlite')
+
+    # Connection pool used by SupplyChainDatabase
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_HEALTH_CHECK = os.getenv('DB_POOL_HEALTH_CHECK', 'true').lower() == 'true'
+
+    # 'production' switches SQLite to WAL with tuned pragmas and routes writes through a single
+    # group-committing writer thread; 'default' keeps the rollback journal and per-insert commits
+    DB_STORAGE_MODE = os.getenv('DB_STORAGE_MODE', 'default')
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '65536'))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_WRITER_BATCH_SIZE = int(os.getenv('DB_WRITER_BATCH_SIZE', '256'))
+    DB_WRITER_MAX_DELAY_MS = float(os.getenv('DB_WRITER_MAX_DELAY_MS', '0'))
+
+    # In-process read-through cache for product and inventory lookups; the total number of cached rows is
+    # capped at DB_READ_CACHE_MAX_ROWS (0 disables the cache) and entries expire after DB_READ_CACHE_TTL seconds
+    DB_READ_CACHE_MAX_ROWS = int(os.getenv('DB_READ_CACHE_MAX_ROWS', '100000'))
+    DB_READ_CACHE_TTL = float(os.getenv('DB_READ_CACHE_TTL', '60'))
+
+    # Rows per executemany() call for the insert_*_bulk methods
+    DB_BULK_CHUNK_SIZE = int(os.getenv('DB_BULK_CHUNK_SIZE', '5000'))
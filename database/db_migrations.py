@@ -0,0 +1,96 @@
+import argparse
+import sqlite3
+
+from database.db_stock_levels import STOCK_LEVELS_TABLE, rebuild_stock_levels
+
+# Ordered (version, description, statements); a statement is SQL or a callable taking a cursor. The applied
+# version is stored in the database file itself (PRAGMA user_version), so existing databases are upgraded in
+# place on the next start.
+SCHEMA_MIGRATIONS = [
+    (
+        1,
+        "Indexes for product/inventory lookups and the predictor's five-way join",
+        (
+            # Covers every products column the predictor join reads, so it never touches the table
+            "CREATE INDEX IF NOT EXISTS idx_products_product_id ON products (product_id, name, description, price)",
+            # Covers the inventory side of the join entirely, so the table itself is never touched
+            "CREATE INDEX IF NOT EXISTS idx_inventory_product_id_quantity ON inventory (product_id, quantity)",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_supplier_id ON transactions (supplier_id)",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_customer_id ON transactions (customer_id)",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_product_id ON transactions (product_id)",
+            "CREATE INDEX IF NOT EXISTS idx_shipments_product_id ON shipments (product_id)",
+            "ANALYZE",
+        ),
+    ),
+    (
+        2,
+        "Incrementally maintained stock levels per product",
+        (
+            STOCK_LEVELS_TABLE,
+            # Seed the totals from the rows written before the table existed
+            rebuild_stock_levels,
+        ),
+    ),
+    (
+        3,
+        "Predictions table written by batch scoring",
+        (
+            # One prediction per row of the training join: a transaction has one row per (products row, inventory
+            # row) of its product, so those two ids complete the key. The key is clustered (WITHOUT ROWID) and
+            # leads with the transaction id, so lookups by transaction need no further index.
+            """
+            CREATE TABLE IF NOT EXISTS predictions (
+                transaction_id INTEGER NOT NULL,
+                product_row_id INTEGER NOT NULL,
+                inventory_id INTEGER NOT NULL,
+                prediction REAL NOT NULL,
+                model TEXT NOT NULL,
+                scored_at TEXT NOT NULL,
+                PRIMARY KEY (transaction_id, product_row_id, inventory_id)
+            ) WITHOUT ROWID
+            """,
+        ),
+    ),
+]
+
+
+def get_schema_version(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connection, migrations=None):
+    migrations = SCHEMA_MIGRATIONS if migrations is None else migrations
+    applied = []
+    current = get_schema_version(connection)
+    for version, _description, statements in migrations:
+        if version <= current:
+            continue
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement(connection.cursor())
+                else:
+                    connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {int(version)}")
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        current = version
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade a supply chain SQLite database to the latest schema")
+    parser.add_argument("db_file", nargs="?", default="supply_chain.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_file)
+    try:
+        print(f"Schema version before: {get_schema_version(conn)}")
+        print(f"Applied migrations: {migrate(conn) or 'none'}")
+        print(f"Schema version after: {get_schema_version(conn)}")
+    finally:
+        conn.close()
@@ -1,137 +1,233 @@
-import random
-from datetime import datetime, timedelta
-
-import logging
-
-from faker import Faker
-
-from database.db import db
-from log_config.logging_config import logging_config
-
-logging_config.configure_logger()
-logging_config.configure_eliot()
-logging_config.initialize_spinner()
-
-# Initialize faker generator
-fake = Faker()
-
-# Define the number of entries to generate
-num_entries = 5000
-
-# Generate suppliers and customers first
-suppliers = []
-customers = []
-
-for i in range(num_entries):
-    supplier = {
-        "name": fake.company(),
-        "address": fake.address(),
-    }
-    try:
-        supplier = db.insert_supplier(supplier)
-        suppliers.append(supplier)
-        logging.info(f'Supplier {supplier["name"]} inserted successfully.')
-    except Exception as e:
-        logging.error(f'An error occurred while inserting supplier: {e}')
-
-    customer = {
-        "name": fake.name(),
-        "address": fake.address(),
+import argparse
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from database.db import SCHEMA
+from database.db_config import DatabaseConfig
+from database.db_migrations import get_schema_version, migrate
+from database.db_stock_levels import STOCK_LEVEL_UPSERTS
+
+# Faker provider calls behind each pool of strings. Faker is only called pool_size times per kind; every row
+# then draws its text from the pools with NumPy, which is what keeps generation fast at millions of rows.
+STRING_POOLS = {
+    "company": lambda fake: fake.company(),
+    "person": lambda fake: fake.name(),
+    "address": lambda fake: fake.address(),
+    "product_name": lambda fake: fake.catch_phrase(),
+    "description": lambda fake: fake.bs(),
+    "detail": lambda fake: fake.sentence(nb_words=5),
+}
+
+INSERTS = {
+    "suppliers": "INSERT INTO suppliers (id, name, address) VALUES (?, ?, ?)",
+    "customers": "INSERT INTO customers (id, name, address) VALUES (?, ?, ?)",
+    "products": "INSERT INTO products (id, product_id, name, description, price) VALUES (?, ?, ?, ?, ?)",
+    "inventory": "INSERT INTO inventory (id, product_id, quantity) VALUES (?, ?, ?)",
+    "transactions": "INSERT INTO transactions (id, product_id, transaction_detail, supplier_id, customer_id, quantity, "
+                    "shipment_date, expected_delivery_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "shipments": "INSERT INTO shipments (id, supplier_id, customer_id, product_id, quantity, shipment_date, "
+                 "expected_delivery_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+}
+# Stable per-kind numbers for seeding each chunk's generator
+KINDS = ("suppliers", "customers", "products", "transactions")
+
+# Set in each worker process (and in the parent when running without workers)
+_pools = None
+
+
+def string_pools(seed, size):
+    # name -> object array of size Faker strings, the same for the same seed
+    import numpy as np
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    return {name: np.array([make(fake) for _ in range(size)], dtype=object) for name, make in STRING_POOLS.items()}
+
+
+def _init_worker(pools):
+    global _pools
+    _pools = pools
+
+
+def product_codes(ids):
+    # products.product_id for product row ids: "P" and seven or more digits, which the API's product id
+    # validation accepts and the original six-digit codes never collide with
+    import numpy as np
+
+    return np.strings.add("P", np.strings.zfill(np.asarray(ids).astype(str), 7))
+
+
+def _pick(rng, pool, count):
+    return pool[rng.integers(0, len(pool), count)].tolist()
+
+
+def _stock_totals(products, quantities):
+    # (product_id, total quantity) per distinct product of a chunk, for the stock_levels upserts
+    import numpy as np
+
+    unique, inverse = np.unique(products, return_inverse=True)
+    totals = np.bincount(inverse, weights=quantities).astype(np.int64)
+    return list(zip(product_codes(unique).tolist(), totals.tolist()))
+
+
+def _generate(task):
+    # Builds the rows of one chunk (table -> rows) and its stock movements (table -> per-product totals). The
+    # generator is seeded from (seed, kind, chunk number), so a chunk's rows do not depend on which worker
+    # builds it or in what order.
+    import numpy as np
+
+    kind, chunk, seed, first_id, count, context = task
+    rng = np.random.default_rng([seed, KINDS.index(kind), chunk])
+    ids = np.arange(first_id, first_id + count)
+    id_list = ids.tolist()
+
+    if kind in ("suppliers", "customers"):
+        names = _pick(rng, _pools["company" if kind == "suppliers" else "person"], count)
+        return {kind: list(zip(id_list, names, _pick(rng, _pools["address"], count)))}, {}
+
+    if kind == "products":
+        codes = product_codes(ids).tolist()
+        prices = np.round(rng.uniform(10, 1000, count), 2).tolist()
+        quantities = rng.integers(1, 101, count)
+        inventory_ids = range(context["first_inventory_id"] + first_id - context["first_product_id"],
+                              context["first_inventory_id"] + first_id - context["first_product_id"] + count)
+        rows = {
+            "products": list(zip(id_list, codes, _pick(rng, _pools["product_name"], count),
+                                 _pick(rng, _pools["description"], count), prices)),
+            "inventory": list(zip(inventory_ids, codes, quantities.tolist())),
+        }
+        return rows, {"inventory": list(zip(codes, quantities.tolist()))}
+
+    # Transactions, each with its shipment under the same id (the predictor joins them on it). Products,
+    # suppliers and customers are drawn from the ones generated in the same run, so every reference resolves.
+    products = rng.integers(context["first_product_id"], context["last_product_id"] + 1, count)
+    codes = product_codes(products).tolist()
+    suppliers = rng.integers(context["first_supplier_id"], context["last_supplier_id"] + 1, count).tolist()
+    customers = rng.integers(context["first_customer_id"], context["last_customer_id"] + 1, count).tolist()
+    quantities = rng.integers(1, 101, count)
+    # Dates are offsets into a table of pre-formatted days, so no date is formatted per row
+    dates = context["dates"]
+    shipped = rng.integers(0, context["days"], count)
+    shipment_dates = dates[shipped].tolist()
+    expected_dates = dates[shipped + rng.integers(0, context["delivery_days"] + 1, count)].tolist()
+    totals = _stock_totals(products, quantities)
+    quantities = quantities.tolist()
+    rows = {
+        "transactions": list(zip(id_list, codes, _pick(rng, _pools["detail"], count), suppliers, customers,
+                                 quantities, shipment_dates, expected_dates)),
+        "shipments": list(zip(id_list, suppliers, customers, codes, quantities, shipment_dates, expected_dates)),
     }
+    return rows, {"transactions": totals, "shipments": totals}
+
+
+def _chunks(kind, seed, first_id, total, chunk_size, context=None):
+    for chunk, offset in enumerate(range(0, total, chunk_size)):
+        yield kind, chunk, seed, first_id + offset, min(chunk_size, total - offset), context
+
+
+def _run(tasks, workers, pools):
+    # Yields each task's rows in order. With workers, chunks are built in parallel processes while the parent
+    # inserts the previous ones; at most two chunks per worker are in flight, so memory stays bounded.
+    if workers <= 1:
+        _init_worker(pools)
+        for task in tasks:
+            yield _generate(task)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(pools,)) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_generate, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate(db_file, suppliers, customers, products, transactions, seed=0, workers=None, chunk_size=100000,
+             pool_size=1000, start_date="2024-01-01", days=365, delivery_days=30):
+    # Appends the given number of rows to each table of db_file (creating the schema if needed) and returns
+    # rows per table plus the elapsed seconds. The same arguments always produce the same rows.
+    import numpy as np
+
+    if transactions and not (suppliers and customers and products):
+        raise ValueError("Transactions need at least one supplier, customer and product to refer to")
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    start = time.perf_counter()
+    pools = string_pools(seed, pool_size)
+
+    conn = sqlite3.connect(db_file)
     try:
-        customer = db.insert_customer(customer)
-        customers.append(customer)
-        logging.info(f'Customer {customer["name"]} inserted successfully.')
-    except Exception as e:
-        logging.error(f'An error occurred while inserting customer: {e}')
-
-        # Log progress of supplier and customer generation
-    if (i + 1) % 100 == 0:
-        logging.info(f'Generated {i + 1} suppliers and customers')
-
-# Check if suppliers and customers are not empty
-if not suppliers:
-    raise ValueError("No suppliers were inserted")
-
-if not customers:
-    raise ValueError("No customers were inserted")
-
-spinner = logging_config.initialize_spinner()
-spinner.start()
-
-# Generate products, inventory, transactions, and shipments
-for i in range(num_entries):
-
-    # Get tomorrow's date
-    tomorrow = datetime.now() + timedelta(days=1)
-
-    # Get a date 30 days from now
-    end_date = datetime.now() + timedelta(days=30)
-
-    # Generate shipment_date and expected_delivery_date
-    shipment_date = fake.date_between_dates(date_start=tomorrow, date_end=end_date)
-
-    # Convert shipment_date to a datetime object for comparison
-    shipment_date_obj = datetime.strptime(str(shipment_date), "%Y-%m-%d")
-
-    # Get a date 30 days from shipment_date
-    end_date_from_shipment = shipment_date_obj + timedelta(days=30)
-
-    # Generate expected_delivery_date between shipment_date and end_date_from_shipment
-    expected_delivery_date = fake.date_between_dates(date_start=shipment_date_obj, date_end=end_date_from_shipment)
-
-    # Convert expected_delivery_date to datetime object for comparison
-    expected_delivery_date_obj = datetime.strptime(str(expected_delivery_date), "%Y-%m-%d")
-
-    # Check if expected_delivery_date is before shipment_date
-    if expected_delivery_date_obj < shipment_date_obj:
-        raise ValueError("Expected delivery date cannot be before shipment date")
-
-        # Log progress of product, inventory, transaction, and shipment generation
-    if (i + 1) % 100 == 0:
-        logging.info(f'Generated {i + 1} products, inventories, transactions, and shipments')
-
-    product_id = ''.join(random.choices('0123456789', k=6))
-    product = {
-        "product_id": product_id,
-        "name": fake.catch_phrase(),
-        "description": fake.bs(),
-        "price": random.uniform(10, 1000),
-    }
-    db.insert_product(product)
-
-    quantity = random.randint(1, 100)
-    inventory = {
-        "product_id": product_id,
-        "quantity": quantity,
-    }
-    db.insert_inventory(inventory)
-
-    supplier_id = suppliers[random.randint(0, len(suppliers) - 1)]['id']
-    customer_id = customers[random.randint(0, len(customers) - 1)]['id']
-    # Check if supplier_id is not None
-    if supplier_id is not None:
-        transaction_detail = fake.sentence(nb_words=5)
-        shipment_date = fake.date(pattern="%Y-%m-%d", end_datetime=None)
-        expected_delivery_date = fake.date(pattern="%Y-%m-%d", end_datetime=None)
-        transaction = {
-            "product_id": product_id,
-            "transaction_detail": transaction_detail,
-            "supplier_id": supplier_id,
-            "customer_id": customer_id,
-            "quantity": quantity,
-            "shipment_date": shipment_date,
-            "expected_delivery_date": expected_delivery_date,
-        }
-        db.insert_transaction(transaction)
-
-        shipment = {
-            "supplier_id": supplier_id,
-            "customer_id": customer_id,
-            "product_id": product_id,
-            "quantity": quantity,
-            "shipment_date": shipment_date,
-            "expected_delivery_date": expected_delivery_date,
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        # Rows from a run that dies halfway are simply regenerated, so skip the fsync per commit
+        conn.execute("PRAGMA synchronous=OFF")
+        top = {table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0] for table in INSERTS}
+        if top["shipments"] > top["transactions"]:
+            raise ValueError("shipments has ids past the last transaction; new shipments could not share their "
+                             "transaction's id")
+        # Stock levels are kept up to date as on every insert; a database without the table yet gets it, seeded
+        # from all rows, from the migration below
+        track_stock = get_schema_version(conn) >= 2
+
+        context = {
+            "first_supplier_id": top["suppliers"] + 1,
+            "last_supplier_id": top["suppliers"] + suppliers,
+            "first_customer_id": top["customers"] + 1,
+            "last_customer_id": top["customers"] + customers,
+            "first_product_id": top["products"] + 1,
+            "last_product_id": top["products"] + products,
+            "first_inventory_id": top["inventory"] + 1,
+            "days": days,
+            "delivery_days": delivery_days,
+            "dates": (np.datetime64(start_date, "D") + np.arange(days + delivery_days)).astype(str).astype(object),
         }
-        db.insert_shipment(shipment)
-        spinner.stop()
+        tasks = [
+            *_chunks("suppliers", seed, top["suppliers"] + 1, suppliers, chunk_size),
+            *_chunks("customers", seed, top["customers"] + 1, customers, chunk_size),
+            *_chunks("products", seed, top["products"] + 1, products, chunk_size, context),
+            *_chunks("transactions", seed, top["transactions"] + 1, transactions, chunk_size, context),
+        ]
+        counts = dict.fromkeys(INSERTS, 0)
+        for rows, stock in _run(tasks, workers, pools):
+            cursor = conn.cursor()
+            for table, table_rows in rows.items():
+                cursor.executemany(INSERTS[table], table_rows)
+                counts[table] += len(table_rows)
+            if track_stock:
+                for table, totals in stock.items():
+                    cursor.executemany(STOCK_LEVEL_UPSERTS[table], totals)
+            conn.commit()
+        # Indexes are built once over the loaded rows rather than maintained row by row
+        migrate(conn)
+    finally:
+        conn.close()
+    return counts, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a supply chain database with reproducible synthetic data")
+    parser.add_argument("db_file", nargs="?", default=DatabaseConfig.DB_CONFIG['sqlite'])
+    parser.add_argument("--suppliers", type=int, default=5000)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=5000, help="Products, each with one inventory row")
+    parser.add_argument("--transactions", type=int, default=5000, help="Transactions, each with one shipment")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The same seed, sizes and chunk size always produce the same rows")
+    parser.add_argument("--workers", type=int, default=None, help="Generator processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Rows generated and inserted at a time")
+    parser.add_argument("--pool-size", type=int, default=1000, help="Faker strings pre-generated per text kind")
+    parser.add_argument("--start-date", default="2024-01-01", help="First possible shipment date")
+    parser.add_argument("--days", type=int, default=365, help="Shipment dates fall within this many days")
+    args = parser.parse_args()
+
+    counts, seconds = generate(args.db_file, args.suppliers, args.customers, args.products, args.transactions,
+                               seed=args.seed, workers=args.workers, chunk_size=args.chunk_size,
+                               pool_size=args.pool_size, start_date=args.start_date, days=args.days)
+    total = sum(counts.values())
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
+    print(f"Generated {total} rows in {seconds:.2f}s ({total / seconds:.0f} rows/s) into {args.db_file}")
@@ -0,0 +1,144 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, db_name, size=5, timeout=30.0, health_check=True, pragmas=None):
+        self.db_name = db_name
+        self.pragmas = pragmas or {}
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        # LIFO keeps the most recently used (and therefore warmest) connections in rotation
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._checked_out = 0
+        self._acquired = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._replaced = 0
+
+    def connect(self):
+        # Connections are handed between Flask worker threads, so sqlite's thread check is disabled;
+        # the pool guarantees a connection is only used by one thread at a time.
+        connection = sqlite3.connect(self.db_name, check_same_thread=False)
+        for pragma, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {pragma}={value}")
+        return connection
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def _free_slot(self):
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self):
+        start = time.perf_counter()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = None
+
+        if connection is None:
+            if self._reserve_slot():
+                try:
+                    connection = self.connect()
+                except sqlite3.Error:
+                    self._free_slot()
+                    raise
+            else:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(pool size {self.size})"
+                    )
+
+        if self.health_check and not self._is_healthy(connection):
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+            try:
+                connection = self.connect()
+            except sqlite3.Error:
+                # The broken connection is gone, so its slot must not stay reserved
+                self._free_slot()
+                raise
+            with self._lock:
+                self._replaced += 1
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checked_out += 1
+            self._acquired += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        return connection
+
+    def release(self, connection):
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            # A connection that cannot even roll back is dropped; the slot is freed for a new one
+            with self._lock:
+                self._checked_out -= 1
+            self._free_slot()
+            return
+        with self._lock:
+            self._checked_out -= 1
+        self._idle.put_nowait(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "checked_out": self._checked_out,
+                "idle": self._created - self._checked_out,
+                "acquired": self._acquired,
+                "replaced": self._replaced,
+                "wait_time_total": self._wait_time_total,
+                "wait_time_avg": self._wait_time_total / self._acquired if self._acquired else 0.0,
+                "wait_time_max": self._wait_time_max,
+            }
+
+    def close(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            self._free_slot()
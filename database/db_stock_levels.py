@@ -0,0 +1,103 @@
+import argparse
+import sqlite3
+import time
+from collections import defaultdict
+
+# Running totals per product_id. SupplyChainDatabase adds to them inside the same write transaction as each
+# inventory, transaction and shipment insert.
+#
+# on_hand is defined as inventory_quantity - shipment_quantity: what inventory has received minus what has
+# physically left. Transactions are deliberately not subtracted. A transaction is the order and its shipment
+# (recorded under the same id, with the same quantity) is the movement, so subtracting both would count every
+# sale twice. transaction_quantity is returned alongside, so a consumer that wants inventory minus ordered
+# quantities (for example to include orders not yet shipped) can compute it from the same row.
+STOCK_LEVELS_TABLE = """
+    CREATE TABLE IF NOT EXISTS stock_levels (
+        product_id TEXT PRIMARY KEY,
+        inventory_quantity INTEGER NOT NULL DEFAULT 0,
+        transaction_quantity INTEGER NOT NULL DEFAULT 0,
+        shipment_quantity INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+"""
+
+# Source table -> stock_levels column it adds to
+SOURCES = (
+    ("inventory", "inventory_quantity"),
+    ("transactions", "transaction_quantity"),
+    ("shipments", "shipment_quantity"),
+)
+
+STOCK_LEVEL_UPSERTS = {
+    table: f"INSERT INTO stock_levels (product_id, {column}) VALUES (?, ?) "
+           f"ON CONFLICT (product_id) DO UPDATE SET {column} = {column} + excluded.{column}"
+    for table, column in SOURCES
+}
+
+STOCK_LEVEL_COLUMNS = ("product_id", "on_hand", "inventory_quantity", "transaction_quantity", "shipment_quantity")
+STOCK_LEVEL_QUERY = """
+    SELECT product_id, inventory_quantity - shipment_quantity, inventory_quantity, transaction_quantity,
+           shipment_quantity
+    FROM stock_levels WHERE product_id = ?
+"""
+
+
+def add_stock_movements(cursor, table, movements):
+    # movements are (product_id, quantity) pairs; they are summed per product first, so a bulk load issues
+    # one upsert per distinct product rather than one per row
+    totals = defaultdict(int)
+    for product_id, quantity in movements:
+        totals[product_id] += quantity
+    cursor.executemany(STOCK_LEVEL_UPSERTS[table], totals.items())
+
+
+def rebuild_stock_levels(cursor, chunk_size=50000):
+    # Recomputes every total from the raw tables, e.g. after rows were written by something other than
+    # SupplyChainDatabase. Each table is read in keyset chunks so only one chunk of rows and one running total
+    # per product are held in memory. Callers run this inside a write transaction, which keeps inserts out
+    # until the new totals are in place.
+    totals = defaultdict(lambda: [0, 0, 0])
+    for position, (table, _column) in enumerate(SOURCES):
+        after_id = 0
+        while True:
+            rows = cursor.execute(
+                f"SELECT id, product_id, quantity FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                break
+            for _id, product_id, quantity in rows:
+                totals[product_id][position] += quantity
+            after_id = rows[-1][0]
+    cursor.execute("DELETE FROM stock_levels")
+    cursor.executemany(
+        "INSERT INTO stock_levels (product_id, inventory_quantity, transaction_quantity, shipment_quantity) "
+        "VALUES (?, ?, ?, ?)",
+        ((product_id, *values) for product_id, values in totals.items()),
+    )
+    return len(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the stock_levels aggregates from the raw tables")
+    parser.add_argument("db_file", nargs="?", default="supply_chain.db")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    # Imported here because the migrations themselves import this module
+    from database.db_migrations import migrate
+
+    conn = sqlite3.connect(args.db_file)
+    try:
+        # Creates the table on databases that predate it; inserts then keep it current with upserts
+        migrate(conn)
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            products = rebuild_stock_levels(conn.cursor(), args.chunk_size)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"Rebuilt stock levels for {products} products in {time.perf_counter() - start:.2f}s")
+    finally:
+        conn.close()
@@ -0,0 +1,124 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class WriterClosedError(Exception):
+    pass
+
+
+# Single writer thread that group-commits queued write operations. Each operation is a callable
+# taking a cursor; everything queued while the previous batch was committing runs inside one
+# IMMEDIATE transaction (one fsync), each in its own savepoint so a failing operation does not
+# roll back its neighbours.
+class SQLiteWriter:
+    def __init__(self, connect, batch_size=256, max_delay=0.0):
+        self._connect = connect
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._batches = 0
+        self._operations = 0
+        self._largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise WriterClosedError("The database writer has been shut down")
+            self._queue.put((operation, future))
+        return future.result()
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        connection = self._connect()
+        # Transactions are managed explicitly so a whole batch shares a single commit
+        connection.isolation_level = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch, stop = self._collect_batch(item)
+                self._commit_batch(connection, batch)
+                if stop:
+                    break
+        finally:
+            connection.close()
+
+    def _commit_batch(self, connection, batch):
+        cursor = connection.cursor()
+        outcomes = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT write_op")
+                try:
+                    outcomes.append((future, operation(cursor), None))
+                    cursor.execute("RELEASE write_op")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_op")
+                    cursor.execute("RELEASE write_op")
+                    outcomes.append((future, None, e))
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batches += 1
+            self._operations += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "operations": self._operations,
+                "largest_batch": self._largest_batch,
+                "avg_batch": self._operations / self._batches if self._batches else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
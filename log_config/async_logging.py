@@ -0,0 +1,192 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+OVERFLOW_POLICIES = ('drop', 'block', 'sample')
+
+
+class FileSink:
+    # Only the writer thread touches the file after construction
+    def __init__(self, path, mode='a', rotation_bytes=None):
+        self.path = path
+        self.rotation_bytes = rotation_bytes
+        self.file = open(path, mode, encoding='utf-8')
+        self.size = self.file.tell()
+
+    def write(self, text):
+        if self.rotation_bytes and self.size and self.size + len(text) > self.rotation_bytes:
+            self._rotate()
+        self.file.write(text)
+        self.size += len(text)
+
+    def _rotate(self):
+        # Same naming scheme as loguru's rotation: app.log -> app.<timestamp>.log
+        self.file.close()
+        root, extension = os.path.splitext(self.path)
+        os.replace(self.path, f"{root}.{time.strftime('%Y-%m-%d_%H-%M-%S')}_{time.time_ns() % 1000000:06d}{extension}")
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.size = 0
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class AsyncLogWriter:
+    # Log calls only format their record and put it on a bounded queue; a daemon thread drains the queue
+    # and writes each batch with one write() per sink. When the queue is full, the overflow policy decides:
+    # 'drop' discards the record, 'block' waits for space, and 'sample' starts keeping only one record in
+    # sample_every once the queue is sample_threshold full (and drops everything once it is full).
+    def __init__(self, max_queue_size=10000, overflow_policy='drop', batch_size=512, flush_interval=0.2,
+                 sample_every=10, sample_threshold=0.8):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow_policy!r}; choose one of {OVERFLOW_POLICIES}")
+        self.overflow_policy = overflow_policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_every = max(sample_every, 1)
+        self.sample_threshold = int(max_queue_size * sample_threshold)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._sinks = []
+        self._closed = False
+        self._sample_counter = 0
+        # Counters are plain ints; updates race benignly and are only used for monitoring
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.blocked = 0
+        self.batches = 0
+        self.write_errors = 0
+        self._thread = threading.Thread(target=self._run, name="async-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_file_sink(self, path, mode='a', rotation_bytes=None):
+        sink = FileSink(path, mode, rotation_bytes)
+        self._sinks.append(sink)
+        return sink
+
+    def submit(self, sink, text):
+        if self._closed:
+            self.dropped += 1
+            return False
+        if self.overflow_policy == 'sample' and self._queue.qsize() >= self.sample_threshold:
+            self._sample_counter += 1
+            if self._sample_counter % self.sample_every:
+                self.sampled_out += 1
+                return False
+        try:
+            self._queue.put_nowait((sink, text))
+        except queue.Full:
+            if self.overflow_policy != 'block':
+                self.dropped += 1
+                return False
+            self.blocked += 1
+            self._queue.put((sink, text))
+        self.enqueued += 1
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        by_sink = {}
+        for sink, text in batch:
+            by_sink.setdefault(sink, []).append(text)
+        for sink, texts in by_sink.items():
+            try:
+                sink.write(''.join(texts))
+                sink.flush()
+            except (OSError, ValueError):
+                self.write_errors += len(texts)
+        self.written += len(batch)
+        self.batches += 1
+
+    def stats(self):
+        return {
+            "overflow_policy": self.overflow_policy,
+            "queue_size": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "blocked": self.blocked,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # The sentinel waits for space even under the drop policy so that everything queued gets written
+        self._queue.put(None)
+        self._thread.join()
+        for sink in self._sinks:
+            sink.close()
+
+
+class AsyncLogHandler(logging.Handler):
+    # Formats in the calling thread (so the record's arguments are captured as they were) and defers the write
+    def __init__(self, writer, sink, level=logging.NOTSET):
+        super().__init__(level)
+        self.writer = writer
+        self.sink = sink
+
+    def emit(self, record):
+        try:
+            self.writer.submit(self.sink, self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+
+class AsyncLogStream:
+    # Text file-like object for libraries that log to a stream (eliot's to_file) or a callable (loguru)
+    def __init__(self, writer, sink):
+        self.writer = writer
+        self.sink = sink
+
+    def write(self, text):
+        if not isinstance(text, str):
+            # Tells eliot to serialise to str rather than bytes
+            raise TypeError("AsyncLogStream only accepts str")
+        if text:
+            self.writer.submit(self.sink, text)
+        return len(text)
+
+    def __call__(self, message):
+        self.write(str(message))
+
+    def flush(self):
+        pass
+
+    @staticmethod
+    def writable():
+        return True
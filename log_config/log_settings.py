@@ -0,0 +1,19 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LogSettings:
+    # 'sync' writes every record to its file in the calling thread; 'async' puts records on a bounded
+    # queue that a background thread writes out in batches
+    LOG_MODE = os.getenv('LOG_MODE', 'sync')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    # What to do when the queue is full: 'drop', 'block' or 'sample'
+    LOG_OVERFLOW_POLICY = os.getenv('LOG_OVERFLOW_POLICY', 'drop')
+    # Under the 'sample' policy, keep one record in LOG_SAMPLE_EVERY once the queue is this full
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '10'))
+    LOG_SAMPLE_THRESHOLD = float(os.getenv('LOG_SAMPLE_THRESHOLD', '0.8'))
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '512'))
+    LOG_FLUSH_INTERVAL_MS = float(os.getenv('LOG_FLUSH_INTERVAL_MS', '200'))
+    LOG_ROTATION_BYTES = int(os.getenv('LOG_ROTATION_BYTES', str(10 * 1024 * 1024)))
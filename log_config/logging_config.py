@@ -1,19 +1,71 @@
-from time import sleep
-
-from eliot import to_file
-from halo import Halo
-from loguru import logger
 import logging
+import threading
 
 
 class LoggingConfig:
+    # Importing this module has no side effects: sinks are added by configure(), which the application
+    # bootstrap (and each CLI entry point) calls once, and the spinner is only built when a CLI asks for it.
     def __init__(self):
-        self.spinner = self.initialize_spinner()
-        self.configure_logger()
-        self.configure_eliot()
+        self._spinner = None
+        self._configured = False
+        self._configure_lock = threading.Lock()
+        self.async_writer = None
+
+    def configure(self):
+        from log_config.log_settings import LogSettings
+
+        with self._configure_lock:
+            if self._configured:
+                return
+            if LogSettings.LOG_MODE == 'async':
+                self.configure_async(LogSettings)
+            else:
+                self.configure_logger()
+                self.configure_eliot()
+            self._configured = True
+
+    def configure_async(self, settings):
+        # Same three log files as the synchronous setup, written by one background thread
+        from eliot import to_file
+        from loguru import logger
+
+        from log_config.async_logging import AsyncLogHandler, AsyncLogStream, AsyncLogWriter
+
+        writer = AsyncLogWriter(
+            max_queue_size=settings.LOG_QUEUE_SIZE,
+            overflow_policy=settings.LOG_OVERFLOW_POLICY,
+            batch_size=settings.LOG_BATCH_SIZE,
+            flush_interval=settings.LOG_FLUSH_INTERVAL_MS / 1000.0,
+            sample_every=settings.LOG_SAMPLE_EVERY,
+            sample_threshold=settings.LOG_SAMPLE_THRESHOLD,
+        )
+        app_sink = writer.add_file_sink("logs/app.log", rotation_bytes=settings.LOG_ROTATION_BYTES)
+        logger.add(AsyncLogStream(writer, app_sink))
+
+        python_sink = writer.add_file_sink("logs/python_logger.log")
+        logging.basicConfig(handlers=[AsyncLogHandler(writer, python_sink)], level=logging.INFO)
+
+        to_file(AsyncLogStream(writer, writer.add_file_sink("logs/eliot.log", "w")))
+        self.async_writer = writer
+
+    def stats(self):
+        if self.async_writer is None:
+            return {"mode": "sync"}
+        return {"mode": "async", **self.async_writer.stats()}
+
+    def close(self):
+        # Drains the async queue; a no-op in synchronous mode
+        if self.async_writer is not None:
+            self.async_writer.close()
+
+    @property
+    def configured(self):
+        return self._configured
 
     @staticmethod
     def configure_logger():
+        from loguru import logger
+
         # Configure Loguru
         logger.add("logs/app.log", rotation="10 MB")
 
@@ -22,19 +74,29 @@ class LoggingConfig:
 
     @staticmethod
     def initialize_spinner():
+        # Halo is only used by CLI tools, so it is imported on first use
+        from halo import Halo
+
         # Initialize Halo with a fun emoji
         spinner = Halo(text='🚀 Processing...', spinner='dots')
         return spinner  # return the spinner object
 
     @staticmethod
     def configure_eliot():
+        from eliot import to_file
+
         # Direct Eliot's logs to a file
         to_file(open("logs/eliot.log", "w"))
 
+    @property
+    def spinner(self):
+        if self._spinner is None:
+            self._spinner = self.initialize_spinner()
+        return self._spinner
+
     def start_spinner(self):
         # Start the spinner
         self.spinner.start()
-        sleep(2)
 
     def stop_spinner(self):
         # Stop the spinner and add a fun emoji
@@ -42,9 +104,3 @@ class LoggingConfig:
 
 
 logging_config = LoggingConfig()
-logging_config.configure_logger()
-logging_config.initialize_spinner()
-logging_config.configure_eliot()
-logging_config.start_spinner()
-logging_config.stop_spinner()
-
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from database.db_config import DatabaseConfig
+from database.db_migrations import migrate
+from machine_learning.data_loader import DATE_COLUMNS, TRAINING_JOIN, iter_chunks
+from machine_learning.inference import FEATURE_COLUMNS, load_model
+from machine_learning.ml_config import MLConfig
+
+# Rescoring replaces the previous prediction
+INSERT_PREDICTION = """
+    INSERT OR REPLACE INTO predictions (transaction_id, product_row_id, inventory_id, prediction, model, scored_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SCORING_QUERY = """
+    SELECT transactions.id AS transaction_id, products.id AS product_row_id, inventory.id AS inventory_id,
+           inventory.quantity AS inventory_quantity, products.price, shipments.shipment_date,
+           shipments.expected_delivery_date
+""" + TRAINING_JOIN + """
+    WHERE transactions.id > ? AND transactions.id <= ?
+"""
+TRANSACTION_PRODUCTS_QUERY = """
+    SELECT id, product_id FROM transactions WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+"""
+# Rows per product id among the given ones (a JSON array), from the covering product_id indexes
+PRODUCT_ROWS_QUERY = """
+    SELECT product_id, COUNT(*) FROM {table}
+    WHERE product_id IN (SELECT value FROM json_each(?))
+    GROUP BY product_id
+"""
+
+_DONE = object()
+
+
+def _put(items, item, failed):
+    # Blocks while the queue is full, but gives up once another stage has failed so nothing waits forever
+    while not failed.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(items, failed):
+    while not failed.is_set():
+        try:
+            return items.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def _fan_outs(conn, after_id, top, limit):
+    # (id, join rows) of the next limit transactions after after_id. The row count is an upper bound: suppliers,
+    # customers and shipments match at most once (by primary key), products and inventory once per row with
+    # the transaction's product id. Each table is counted once per distinct product rather than per transaction.
+    transactions = conn.execute(TRANSACTION_PRODUCTS_QUERY, (after_id, top, limit)).fetchall()
+    product_ids = json.dumps(sorted({product_id for _, product_id in transactions if product_id is not None}))
+    fan_out = {}
+    for table in ("products", "inventory"):
+        counts = dict(conn.execute(PRODUCT_ROWS_QUERY.format(table=table), (product_ids,)))
+        for product_id in {product_id for _, product_id in transactions}:
+            fan_out[product_id] = fan_out.get(product_id, 1) * counts.get(product_id, 0)
+    return [(transaction_id, fan_out[product_id]) for transaction_id, product_id in transactions]
+
+
+def _windows(conn, after_id, top, max_rows):
+    # Yields (low, high] transaction id ranges whose join has at most max_rows rows. A transaction whose own
+    # fan-out exceeds max_rows gets a window to itself. The fan-outs are fetched max_rows transactions at a
+    # time, each with short queries of their own, so no read transaction stays open between windows.
+    buffered = deque()
+    buffered_rows = 0
+    fetched_to = after_id
+    low = after_id
+    while True:
+        while fetched_to < top and buffered_rows < max_rows and len(buffered) < max_rows:
+            fan_outs = _fan_outs(conn, fetched_to, top, max_rows)
+            if not fan_outs:
+                fetched_to = top
+                break
+            buffered.extend(fan_outs)
+            buffered_rows += sum(rows for _, rows in fan_outs)
+            fetched_to = fan_outs[-1][0]
+        if not buffered:
+            return
+        high, window_rows = buffered.popleft()
+        while buffered and window_rows + buffered[0][1] <= max_rows:
+            high, rows = buffered.popleft()
+            window_rows += rows
+        buffered_rows -= window_rows
+        yield low, high
+        low = high
+
+
+def score_database(db_file, model_path=None, chunksize=None, after_id=0, queue_depth=2):
+    # Scores every row of the training join for the transactions with after_id < id <= MAX(id) and writes the
+    # predictions to the predictions table. Three stages run concurrently, connected by queues of at most
+    # queue_depth chunks. A chunk holds at most chunksize join rows, however many inventory rows each
+    # transaction fans out to, so memory is bounded by 2 * queue_depth + 3 chunks whatever the table size
+    # (a single transaction with more than chunksize join rows is still read as one chunk):
+    #
+    #   reader:  reads one window of transactions with at most chunksize join rows at a time (one short read
+    #            per window, so no read transaction is held open between chunks and the writer never waits
+    #            on it for long)
+    #   scorer:  (this thread) one vectorized model call per chunk
+    #   writer:  executemany + one commit per chunk
+    #
+    # SQLite and onnxruntime release the GIL, so with more than one core the stages overlap. Returns a report
+    # with the row count, elapsed seconds, rows per second and the busy seconds of each stage.
+    import numpy as np
+
+    model_path = model_path or MLConfig.ML_MODEL_PATH
+    chunksize = chunksize or MLConfig.ML_CHUNK_SIZE
+    run = load_model(model_path)
+    model_name = os.path.basename(model_path)
+    scored_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    read_conn = sqlite3.connect(db_file, check_same_thread=False, timeout=DatabaseConfig.DB_BUSY_TIMEOUT_MS / 1000)
+    write_conn = sqlite3.connect(db_file, check_same_thread=False, timeout=DatabaseConfig.DB_BUSY_TIMEOUT_MS / 1000)
+    # The predictions table is part of the schema (migration 3); bring older databases up to date first
+    migrate(write_conn)
+    top = read_conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 0
+
+    chunks = queue.Queue(maxsize=queue_depth)
+    results = queue.Queue(maxsize=queue_depth)
+    failed = threading.Event()
+    errors = []
+    busy = {"read": 0.0, "score": 0.0, "write": 0.0}
+
+    def read():
+        try:
+            start = time.perf_counter()
+            for low, high in _windows(read_conn, after_id, top, chunksize):
+                # The window is fetched whole before it is handed on, which ends the read before the put can
+                # block; it has at most chunksize rows, so it arrives as a single chunk
+                parts = list(iter_chunks(read_conn, SCORING_QUERY, chunksize, params=(low, high),
+                                         text_columns=DATE_COLUMNS))
+                busy["read"] += time.perf_counter() - start
+                for part in parts:
+                    if not _put(chunks, part, failed):
+                        return
+                start = time.perf_counter()
+            _put(chunks, _DONE, failed)
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+
+    def write():
+        try:
+            while True:
+                item = _get(results, failed)
+                if item is _DONE:
+                    return
+                start = time.perf_counter()
+                write_conn.executemany(INSERT_PREDICTION, item)
+                write_conn.commit()
+                busy["write"] += time.perf_counter() - start
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+
+    start = time.perf_counter()
+    rows = 0
+    reader = threading.Thread(target=read, name="scoring-reader", daemon=True)
+    writer = threading.Thread(target=write, name="scoring-writer", daemon=True)
+    reader.start()
+    writer.start()
+    try:
+        while True:
+            columns = _get(chunks, failed)
+            if columns is _DONE:
+                break
+            if not len(columns["transaction_id"]):
+                continue
+            score_start = time.perf_counter()
+            features = np.column_stack([columns[name] for name in FEATURE_COLUMNS]).astype(np.float32)
+            predictions = run(features)
+            batch = list(zip(columns["transaction_id"].tolist(), columns["product_row_id"].tolist(),
+                             columns["inventory_id"].tolist(), predictions.tolist(),
+                             [model_name] * len(predictions), [scored_at] * len(predictions)))
+            busy["score"] += time.perf_counter() - score_start
+            if not _put(results, batch, failed):
+                break
+            rows += len(batch)
+        _put(results, _DONE, failed)
+    except Exception as e:
+        errors.append(e)
+        failed.set()
+    finally:
+        reader.join()
+        writer.join()
+        read_conn.close()
+        write_conn.close()
+    if errors:
+        raise errors[0]
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "high_water_mark": top,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+        "busy_seconds": busy,
+        "model": model_name,
+        "scored_at": scored_at,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every transaction with the saved model and write the "
+                                                 "predictions to the predictions table")
+    parser.add_argument("db_file", nargs="?", default="supply_chain.db")
+    parser.add_argument("--model", default=MLConfig.ML_MODEL_PATH, help="A .onnx, .joblib or .pkl model")
+    parser.add_argument("--chunk-size", type=int, default=MLConfig.ML_CHUNK_SIZE,
+                        help="Join rows read, scored and written per chunk")
+    parser.add_argument("--after-id", type=int, default=0, help="Only score transactions with a larger id")
+    args = parser.parse_args()
+
+    report = score_database(args.db_file, args.model, args.chunk_size, args.after_id)
+    busy = report["busy_seconds"]
+    print(f"Scored {report['rows']} rows (transactions {args.after_id + 1} to {report['high_water_mark']}) with "
+          f"{report['model']} in {report['seconds']:.2f}s: "
+          f"{report['rows_per_second']:.0f} rows/s (read {busy['read']:.2f}s, score {busy['score']:.2f}s, "
+          f"write {busy['write']:.2f}s)")
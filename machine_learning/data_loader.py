@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+
+# Bumped whenever the on-disk layout or the conversions change, so older caches are rebuilt
+CACHE_FORMAT = 1
+
+# CROSS JOIN pins transactions as the outer loop; otherwise the planner may drive the join from
+# products through idx_transactions_product_id, which turns a sequential scan into random reads
+TRAINING_JOIN = """
+    FROM transactions
+    CROSS JOIN suppliers ON transactions.supplier_id = suppliers.id
+    CROSS JOIN customers ON transactions.customer_id = customers.id
+    CROSS JOIN products ON transactions.product_id = products.product_id
+    CROSS JOIN inventory ON transactions.product_id = inventory.product_id
+    CROSS JOIN shipments ON transactions.id = shipments.id
+"""
+TRAINING_QUERY = """
+    SELECT transactions.quantity AS trans_quantity, inventory.quantity AS inventory_quantity,
+           suppliers.name AS supplier_name, customers.name AS customer_name,
+           products.product_id, products.name AS product_name, products.description,
+           products.price, shipments.shipment_date, shipments.expected_delivery_date
+""" + TRAINING_JOIN
+# The same rows without the text columns, for the transactions in an id range (incremental training and the
+# feature store). Readers look ids up with searchsorted, so rows must come in id order; the CROSS JOINs keep
+# transactions as the outer loop, scanned by rowid, so SQLite returns them in that order without a sort step.
+NUMERIC_RANGE_QUERY = """
+    SELECT transactions.id, transactions.quantity AS trans_quantity, inventory.quantity AS inventory_quantity,
+           products.price, shipments.shipment_date, shipments.expected_delivery_date
+""" + TRAINING_JOIN + """
+    WHERE transactions.id > ? AND transactions.id <= ?
+    ORDER BY transactions.id
+"""
+SOURCE_TABLES = ("transactions", "suppliers", "customers", "products", "inventory", "shipments")
+
+# Output columns, in order. Numeric columns are stored with the dtype given here; the text columns become
+# categoricals, stored as int32 codes plus one list of categories each.
+NUMERIC_COLUMNS = {
+    "trans_quantity": "int32",
+    "inventory_quantity": "int32",
+    "price": "float32",
+    "shipment_duration": "int32",
+}
+CATEGORICAL_COLUMNS = ("supplier_name", "customer_name", "product_id", "product_name", "description")
+COLUMNS = ("trans_quantity", "inventory_quantity", "supplier_name", "customer_name", "product_id", "product_name",
+           "description", "price", "shipment_duration")
+CODE_DTYPE = "int32"
+# Parsed into shipment_duration and then dropped
+DATE_COLUMNS = ("shipment_date", "expected_delivery_date")
+
+
+def source_ids(conn):
+    # MAX(id) of every source table, one seek to the end of each primary key
+    return {table: conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0 for table in SOURCE_TABLES}
+
+
+def source_fingerprint(conn, query=TRAINING_QUERY):
+    # Rows are only ever appended to the source tables, so the highest id of each one changes whenever the
+    # query result could. A cache check therefore costs six index seeks, not a scan of any table.
+    state = [CACHE_FORMAT, query, source_ids(conn)]
+    return hashlib.sha256(json.dumps(state).encode()).hexdigest()
+
+
+def appended_only(conn, old, new):
+    # Whether going from the source ids old to new only added join rows for transactions past
+    # old["transactions"]. New transactions add rows of their own; a new shipment only adds rows if its id
+    # belongs to a transaction that was already covered. New rows in any other table can join with covered
+    # transactions, and ids that went backwards mean the database was replaced.
+    if any(old[table] != new[table] for table in SOURCE_TABLES if table not in ("transactions", "shipments")):
+        return False
+    if new["transactions"] < old["transactions"] or new["shipments"] < old["shipments"]:
+        return False
+    late_shipments = conn.execute(
+        "SELECT COUNT(*) FROM shipments WHERE id > ? AND id <= ?", (old["shipments"], old["transactions"])
+    ).fetchone()[0]
+    return not late_shipments
+
+
+def cache_path(cache_dir, db_file):
+    # One cache per database file
+    db_file = os.path.abspath(db_file)
+    digest = hashlib.sha256(db_file.encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(db_file))[0]}-{digest}")
+
+
+def load_training_frame(db_file, chunksize, cache_dir=None, query=TRAINING_QUERY):
+    # Streams the query in chunks of chunksize rows and converts each chunk to compact dtypes as it arrives,
+    # so the raw Python rows of only one chunk are alive at a time. With a cache_dir the converted columns
+    # are appended to files there and memory-mapped back; a later call whose source tables are unchanged
+    # maps those files without running the query. Returns (DataFrame, whether it came from the cache).
+    conn = sqlite3.connect(db_file)
+    try:
+        fingerprint = source_fingerprint(conn, query)
+        path = cache_path(cache_dir, db_file) if cache_dir else None
+        if path:
+            df = read_cache(path, fingerprint)
+            if df is not None:
+                return df, True
+
+        sink = _ColumnSink(path + f".tmp-{os.getpid()}" if path else None)
+        try:
+            for columns in iter_chunks(conn, query, chunksize, categories=sink.categories):
+                sink.append(columns)
+            manifest = sink.close(fingerprint)
+        except BaseException:
+            sink.discard()
+            raise
+    finally:
+        conn.close()
+
+    if not path:
+        return _build_frame(sink.arrays, manifest), False
+    _publish(sink.directory, path)
+    return read_cache(path, fingerprint), False
+
+
+def read_cache(path, fingerprint):
+    # The cached frame if path holds one built for this fingerprint, else None
+    import numpy as np
+
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != CACHE_FORMAT or manifest.get("fingerprint") != fingerprint:
+        return None
+
+    rows = manifest["rows"]
+    arrays = {}
+    for name, dtype in manifest["dtypes"].items():
+        if rows:
+            arrays[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+        else:
+            # An empty file cannot be mapped
+            arrays[name] = np.empty(0, dtype=dtype)
+    return _build_frame(arrays, manifest)
+
+
+def iter_chunks(conn, query, chunksize, params=(), categories=None, text_columns=CATEGORICAL_COLUMNS + DATE_COLUMNS):
+    # Runs query and yields each chunk of chunksize rows converted by convert_chunk. The text_columns the
+    # query returns stay as plain object columns; inferring pandas' string dtype for values that are about
+    # to be factorized or parsed would only add another pass over each chunk.
+    import pandas as pd
+
+    if categories is None:
+        categories = {name: {} for name in CATEGORICAL_COLUMNS}
+    text_dtypes = {name: object for name in text_columns}
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize, dtype=text_dtypes):
+        yield convert_chunk(chunk, categories)
+
+
+def convert_chunk(chunk, categories):
+    # Converts the output columns present in chunk to their compact dtypes; other columns (such as an id)
+    # pass through as NumPy arrays
+    import numpy as np
+    import pandas as pd
+
+    columns = {name: chunk[name].to_numpy() for name in chunk.columns
+               if name not in COLUMNS and name not in DATE_COLUMNS}
+    for name in ("trans_quantity", "inventory_quantity", "price"):
+        if name in chunk:
+            columns[name] = pd.to_numeric(chunk[name], errors="coerce").fillna(0).to_numpy(NUMERIC_COLUMNS[name])
+    if all(name in chunk for name in DATE_COLUMNS):
+        shipped, expected = (pd.to_datetime(chunk[name], format="ISO8601", errors="coerce") for name in DATE_COLUMNS)
+        duration = (expected - shipped).dt.days.fillna(0)
+        columns["shipment_duration"] = duration.to_numpy(NUMERIC_COLUMNS["shipment_duration"])
+
+    for name in CATEGORICAL_COLUMNS:
+        if name not in chunk:
+            continue
+        # Codes are assigned in order of first appearance across all chunks, so they stay stable as chunks
+        # arrive; missing values keep code -1
+        known = categories[name]
+        codes, uniques = pd.factorize(chunk[name].to_numpy())
+        uniques = uniques.tolist()
+        for value in uniques:
+            if value not in known:
+                known[value] = len(known)
+        # The trailing -1 is what a missing value's code (-1) indexes
+        lookup = np.fromiter((known[value] for value in uniques), dtype=CODE_DTYPE, count=len(uniques))
+        columns[name] = np.append(lookup, np.array(-1, dtype=CODE_DTYPE))[codes]
+    return columns
+
+
+def _build_frame(arrays, manifest):
+    import pandas as pd
+
+    columns = {}
+    for name in COLUMNS:
+        if name in manifest["categories"]:
+            columns[name] = pd.Categorical.from_codes(arrays[name], categories=manifest["categories"][name])
+        else:
+            columns[name] = arrays[name]
+    return pd.DataFrame(columns, copy=False)
+
+
+def _publish(directory, path):
+    # The old cache, if any, is replaced only once the new one is complete
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(directory, path)
+
+
+class _ColumnSink:
+    # Collects converted chunks column by column: appended to raw files in directory, or kept in memory
+    # (and concatenated on close) when directory is None
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.categories = {name: {} for name in CATEGORICAL_COLUMNS}
+        self.arrays = {}
+        self.rows = 0
+        self._parts = {name: [] for name in COLUMNS}
+        self._files = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._files = {name: open(os.path.join(directory, f"{name}.bin"), "wb") for name in COLUMNS}
+
+    def append(self, columns):
+        for name, array in columns.items():
+            if self._files:
+                array.tofile(self._files[name])
+            else:
+                self._parts[name].append(array)
+        self.rows += len(columns[COLUMNS[0]])
+
+    def close(self, fingerprint):
+        import numpy as np
+
+        dtypes = {name: NUMERIC_COLUMNS.get(name, CODE_DTYPE) for name in COLUMNS}
+        manifest = {
+            "format": CACHE_FORMAT,
+            "fingerprint": fingerprint,
+            "rows": self.rows,
+            "dtypes": dtypes,
+            "categories": {name: list(known) for name, known in self.categories.items()},
+        }
+        if self._files:
+            for f in self._files.values():
+                f.close()
+            # Written last: a directory without a manifest is never read as a cache
+            with open(os.path.join(self.directory, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+        else:
+            for name, parts in self._parts.items():
+                self.arrays[name] = np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[name])
+            self._parts = {}
+        return manifest
+
+    def discard(self):
+        for f in self._files.values():
+            f.close()
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from machine_learning.data_loader import (
+    COLUMNS,
+    DATE_COLUMNS,
+    NUMERIC_COLUMNS,
+    NUMERIC_RANGE_QUERY,
+    appended_only,
+    cache_path,
+    iter_chunks,
+    source_ids,
+)
+from machine_learning.ml_config import MLConfig
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; the store is then only safe for a single process
+    fcntl = None
+
+# Bumped whenever the layout or the feature definitions change; older stores are rebuilt
+STORE_FORMAT = 1
+# One row per row of the training join, ordered by transaction id (a transaction with several inventory rows
+# for its product has several rows, as in the join)
+STORE_DTYPES = {"transaction_id": "int64"}
+STORE_DTYPES.update((name, NUMERIC_COLUMNS[name]) for name in COLUMNS if name in NUMERIC_COLUMNS)
+
+
+class FeatureStore:
+    # The numeric training features of every joined transaction, precomputed and kept on disk as one raw
+    # column file per feature, memory-mapped by readers.
+    #
+    # manifest.json names the current generation directory, its row count and the MAX(id) of each source
+    # table when the rows were computed. refresh() compares those ids with the database: if only
+    # transactions (and shipments for the new transactions) were appended, the new rows are computed and
+    # appended to the column files before a new manifest is swapped in; any other change rebuilds the store
+    # into a new generation. Readers never need the lock: they map as many rows as the manifest they read
+    # says, and bytes past that are ignored.
+    def __init__(self, db_file, directory=None, chunksize=None):
+        self.db_file = db_file
+        self.directory = cache_path(directory or MLConfig.ML_FEATURE_STORE_DIR, db_file)
+        self.chunksize = chunksize or MLConfig.ML_CHUNK_SIZE
+        self._thread_lock = threading.Lock()
+        self._view = None
+        self._view_stamp = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    @contextmanager
+    def lock(self, blocking=True):
+        # Serializes refreshes between threads and, via flock, between processes sharing the directory.
+        # Yields whether the lock was taken, which is always the case when blocking.
+        if not self._thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "LOCK"), "a+b") as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        yield False
+                        return
+                try:
+                    yield True
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("format") == STORE_FORMAT else None
+
+    def _write_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def refresh(self, rebuild=True, blocking=True):
+        # Brings the store up to date with the database and returns what was done. With rebuild=False a
+        # change that needs a full rebuild is only reported ("stale"), and with blocking=False a refresh
+        # already running elsewhere is reported ("busy") instead of waited for; the inference path uses
+        # both so a request never waits on more than the rows appended since the last refresh.
+        start = time.perf_counter()
+        with self.lock(blocking) as locked:
+            if not locked:
+                return {"action": "busy", "rows": 0, "seconds": time.perf_counter() - start}
+            conn = sqlite3.connect(self.db_file)
+            try:
+                # One read transaction, so the source ids and the rows computed from them agree
+                conn.execute("BEGIN")
+                sources = source_ids(conn)
+                manifest = self._read_manifest()
+                if manifest is not None and manifest["sources"] == sources:
+                    action, rows = "unchanged", 0
+                elif manifest is not None and appended_only(conn, manifest["sources"], sources):
+                    action, rows = "extended", self._extend(conn, manifest, sources)
+                elif rebuild:
+                    action, rows = "rebuilt", self._rebuild(conn, manifest, sources)
+                else:
+                    action, rows = "stale", 0
+                conn.rollback()
+            finally:
+                conn.close()
+        return {"action": action, "rows": rows, "seconds": time.perf_counter() - start}
+
+    def _append_rows(self, conn, generation_dir, rows, after_id, up_to_id):
+        # Appends the rows of transactions in (after_id, up_to_id] to the column files. Anything past the
+        # manifest's row count is left over from an interrupted refresh and is cut off first.
+        import numpy as np
+
+        files = {}
+        try:
+            for name, dtype in STORE_DTYPES.items():
+                f = open(os.path.join(generation_dir, f"{name}.bin"), "ab")
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                files[name] = f
+            added = 0
+            chunks = iter_chunks(conn, NUMERIC_RANGE_QUERY, self.chunksize, params=(after_id, up_to_id),
+                                 text_columns=DATE_COLUMNS)
+            for columns in chunks:
+                columns["transaction_id"] = columns.pop("id")
+                for name, dtype in STORE_DTYPES.items():
+                    columns[name].astype(dtype, copy=False).tofile(files[name])
+                added += len(columns["transaction_id"])
+        finally:
+            for f in files.values():
+                f.close()
+        return added
+
+    def _extend(self, conn, manifest, sources):
+        generation_dir = os.path.join(self.directory, manifest["generation"])
+        added = self._append_rows(conn, generation_dir, manifest["rows"], manifest["sources"]["transactions"],
+                                  sources["transactions"])
+        self._write_manifest({**manifest, "rows": manifest["rows"] + added, "sources": sources})
+        return added
+
+    def _rebuild(self, conn, manifest, sources):
+        number = int(manifest["generation"].rsplit("-", 1)[1]) + 1 if manifest else 0
+        generation = f"generation-{number:06d}"
+        generation_dir = os.path.join(self.directory, generation)
+        shutil.rmtree(generation_dir, ignore_errors=True)
+        os.makedirs(generation_dir)
+        rows = self._append_rows(conn, generation_dir, 0, 0, sources["transactions"])
+        self._write_manifest({"format": STORE_FORMAT, "generation": generation, "rows": rows, "sources": sources,
+                              "dtypes": STORE_DTYPES})
+        # Readers in other processes may still map the old files; POSIX keeps them alive until unmapped
+        for name in os.listdir(self.directory):
+            if name.startswith("generation-") and name != generation:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return rows
+
+    def arrays(self):
+        # name -> read-only memory-mapped column, for the rows of the current manifest
+        import numpy as np
+
+        try:
+            info = os.stat(self.manifest_path)
+            # The manifest is replaced, never rewritten in place, so a new one always has a new inode
+            stamp = (info.st_ino, info.st_mtime_ns)
+        except OSError:
+            return None
+        if stamp == self._view_stamp:
+            return self._view
+        manifest = self._read_manifest()
+        if manifest is None:
+            return None
+        rows = manifest["rows"]
+        generation_dir = os.path.join(self.directory, manifest["generation"])
+        try:
+            view = {name: np.memmap(os.path.join(generation_dir, f"{name}.bin"), dtype=dtype, mode="r",
+                                    shape=(rows,)) if rows else np.empty(0, dtype=dtype)
+                    for name, dtype in manifest["dtypes"].items()}
+        except OSError:
+            # A rebuild replaced the generation between reading the manifest and mapping its files
+            return None
+        view["high_water_mark"] = manifest["sources"]["transactions"]
+        self._view, self._view_stamp = view, stamp
+        return view
+
+    def frame(self):
+        # The stored features as a DataFrame indexed by transaction id, without copying the columns
+        import pandas as pd
+
+        view = self.arrays()
+        if view is None:
+            return None
+        columns = {name: view[name] for name in STORE_DTYPES if name != "transaction_id"}
+        return pd.DataFrame(columns, index=pd.Index(view["transaction_id"], name="transaction_id"), copy=False)
+
+    def lookup(self, transaction_ids):
+        # name -> array of the stored rows for the given transaction ids, in the order given, or None if the
+        # store has not been built. Ids without rows are simply absent.
+        import numpy as np
+
+        view = self.arrays()
+        if view is None:
+            return None
+        ids = view["transaction_id"]
+        wanted = np.asarray(transaction_ids, dtype=np.int64)
+        starts = np.searchsorted(ids, wanted, side="left")
+        ends = np.searchsorted(ids, wanted, side="right")
+        positions = np.concatenate([np.arange(begin, end) for begin, end in zip(starts, ends)]
+                                   or [np.empty(0, dtype=np.int64)])
+        return {name: np.asarray(view[name][positions]) for name in STORE_DTYPES}
+
+    def high_water_mark(self):
+        view = self.arrays()
+        return view["high_water_mark"] if view is not None else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or extend the feature store for a database")
+    parser.add_argument("db_file", nargs="?", default="supply_chain.db")
+    parser.add_argument("--chunk-size", type=int, default=MLConfig.ML_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    store = FeatureStore(args.db_file, chunksize=args.chunk_size)
+    result = store.refresh()
+    print(f"Feature store {result['action']}: {result['rows']} rows added in {result['seconds']:.2f}s "
+          f"({store.directory})")
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from machine_learning.data_loader import (
+    COLUMNS,
+    DATE_COLUMNS,
+    NUMERIC_COLUMNS,
+    NUMERIC_RANGE_QUERY,
+    appended_only,
+    iter_chunks,
+    source_ids,
+)
+from machine_learning.ml_config import MLConfig
+
+
+class LinearSufficientStatistics:
+    # Everything ordinary least squares needs, accumulated row by row: the Gram matrix [1 X]^T [1 X] and the
+    # moment vector [1 X]^T y. Adding a batch of rows is two small matrix products, and solving gives exactly
+    # the coefficients a LinearRegression fitted on all the rows seen so far would have, so the model can be
+    # brought up to date from only the rows appended since the last run.
+    #
+    # high_water_mark is the largest transactions.id already folded in and sources the MAX(id) of every source
+    # table at that point; only appended transactions leave the rows already folded in unchanged.
+    def __init__(self, target_column, feature_columns, gram=None, moment=None, rows=0, high_water_mark=0,
+                 sources=None):
+        import numpy as np
+
+        size = len(feature_columns) + 1
+        self.target_column = target_column
+        self.feature_columns = tuple(feature_columns)
+        self.gram = np.zeros((size, size)) if gram is None else gram
+        self.moment = np.zeros(size) if moment is None else moment
+        self.rows = rows
+        self.high_water_mark = high_water_mark
+        self.sources = sources
+
+    def update(self, features, target):
+        import numpy as np
+
+        augmented = np.empty((len(target), len(self.feature_columns) + 1))
+        augmented[:, 0] = 1.0
+        augmented[:, 1:] = features
+        self.gram += augmented.T @ augmented
+        self.moment += augmented.T @ np.asarray(target, dtype=np.float64)
+        self.rows += len(target)
+
+    def solve(self):
+        # (coefficients, intercept); lstsq rather than solve so a rank-deficient Gram matrix (e.g. a constant
+        # feature) still gets the minimum-norm solution, as LinearRegression does
+        import numpy as np
+
+        solution = np.linalg.lstsq(self.gram, self.moment, rcond=None)[0]
+        return solution[1:], float(solution[0])
+
+    def to_estimator(self):
+        # A LinearRegression carrying the solved coefficients, so predict(), pickling and the ONNX export
+        # work exactly as for a fitted one
+        import numpy as np
+        from sklearn.linear_model import LinearRegression
+
+        model = LinearRegression()
+        model.coef_, model.intercept_ = self.solve()
+        model.n_features_in_ = len(self.feature_columns)
+        model.feature_names_in_ = np.array(self.feature_columns, dtype=object)
+        model.rank_ = int(np.linalg.matrix_rank(self.gram)) - 1
+        return model
+
+    def save(self, path):
+        import numpy as np
+
+        # Written next to the target and renamed over it, so a crash never leaves a torn state file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, target_column=self.target_column, feature_columns=np.array(self.feature_columns),
+                 gram=self.gram, moment=self.moment, rows=self.rows, high_water_mark=self.high_water_mark,
+                 sources=json.dumps(self.sources))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        import numpy as np
+
+        with np.load(path) as state:
+            return LinearSufficientStatistics(
+                str(state["target_column"]),
+                [str(name) for name in state["feature_columns"]],
+                gram=state["gram"],
+                moment=state["moment"],
+                rows=int(state["rows"]),
+                high_water_mark=int(state["high_water_mark"]),
+                # States saved before the source ids were recorded have none and are rebuilt
+                sources=json.loads(str(state["sources"])) if "sources" in state else None,
+            )
+
+
+def feature_columns(target_column):
+    # The numeric columns prepare_data would use as features, in the same order
+    return [name for name in COLUMNS if name in NUMERIC_COLUMNS and name != target_column]
+
+
+def update_statistics(db_file, target_column, state_path, chunksize):
+    # Folds the transactions appended since the saved high-water mark into the saved statistics and saves
+    # them again. If anything other than appended transactions (and their shipments) changed, rows already
+    # folded in may have changed too, so the statistics are rebuilt from every row instead. Returns the
+    # statistics and a report on the delta; the delta's error is measured with the previous model before the
+    # new rows are folded in.
+    import numpy as np
+
+    features = feature_columns(target_column)
+    if target_column not in NUMERIC_COLUMNS:
+        raise ValueError(f"Column '{target_column}' is not a numeric column of the training data")
+
+    stats = None
+    if state_path and os.path.exists(state_path):
+        stats = LinearSufficientStatistics.load(state_path)
+        if stats.target_column != target_column or stats.feature_columns != tuple(features):
+            stats = None
+
+    conn = sqlite3.connect(db_file)
+    try:
+        # One read transaction, so the high-water mark and the rows read below come from the same snapshot
+        conn.execute("BEGIN")
+        sources = source_ids(conn)
+        top = sources["transactions"]
+        rebuilt = None
+        if stats is None:
+            rebuilt = "no usable saved state"
+        elif stats.sources is None:
+            rebuilt = "the saved state does not record the source tables"
+        elif not appended_only(conn, stats.sources, sources):
+            changed = [table for table in sources if stats.sources.get(table) != sources[table]]
+            rebuilt = f"source tables changed beyond appended transactions ({', '.join(changed)})"
+        if rebuilt is not None:
+            stats = LinearSufficientStatistics(target_column, features)
+        previous = stats.solve() if stats.rows else None
+
+        start = time.perf_counter()
+        rows = 0
+        squared_error = 0.0
+        absolute_error = 0.0
+        chunks = iter_chunks(conn, NUMERIC_RANGE_QUERY, chunksize, params=(stats.high_water_mark, top),
+                             text_columns=DATE_COLUMNS)
+        for columns in chunks:
+            matrix = np.column_stack([columns[name] for name in features]).astype(np.float64)
+            target = columns[target_column].astype(np.float64)
+            if previous is not None:
+                errors = matrix @ previous[0] + previous[1] - target
+                squared_error += float(errors @ errors)
+                absolute_error += float(np.abs(errors).sum())
+            stats.update(matrix, target)
+            rows += len(target)
+        stats.high_water_mark = top
+        stats.sources = sources
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if state_path:
+        stats.save(state_path)
+    report = {
+        "rows": rows,
+        "total_rows": stats.rows,
+        "high_water_mark": top,
+        "rebuilt": rebuilt,
+        "seconds": time.perf_counter() - start,
+        "delta_mse": squared_error / rows if rows and previous is not None else None,
+        "delta_mae": absolute_error / rows if rows and previous is not None else None,
+    }
+    return stats, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the saved model with the transactions appended since "
+                                                 "the last run and re-export it")
+    parser.add_argument("db_file", nargs="?", default="supply_chain.db")
+    parser.add_argument("--target-column", default="trans_quantity")
+    parser.add_argument("--state", default=MLConfig.ML_TRAINING_STATE)
+    parser.add_argument("--chunk-size", type=int, default=MLConfig.ML_CHUNK_SIZE)
+    parser.add_argument("--full", action="store_true", help="Discard the saved state and refit on every row")
+    args = parser.parse_args()
+
+    # Imported here because supply_chain_ml imports this module
+    from log_config.logging_config import logging_config
+    from machine_learning.supply_chain_ml import SupplyChainPredictor
+
+    logging_config.configure()
+    if args.full and os.path.exists(args.state):
+        os.remove(args.state)
+    predictor = SupplyChainPredictor(db_file=args.db_file, target_column=args.target_column)
+    predictor.train_incremental(state_path=args.state, chunksize=args.chunk_size)
+    for file_format in ('pkl', 'joblib', 'onnx'):
+        predictor.save_model(file_format=file_format)
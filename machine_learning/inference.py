@@ -0,0 +1,261 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database.db_config import DatabaseConfig
+from machine_learning.feature_store import FeatureStore
+from machine_learning.ml_config import MLConfig
+
+# The numeric columns prepare_data feeds the model when the target is trans_quantity, in training order
+FEATURE_COLUMNS = ("inventory_quantity", "price", "shipment_duration")
+
+_STOP = object()
+
+
+class ModelUnavailableError(Exception):
+    pass
+
+
+def load_model(path):
+    # Returns a function mapping an (n, features) float32 array to n predictions. ONNX files run on
+    # onnxruntime; .joblib and .pkl files hold a scikit-learn estimator.
+    import numpy as np
+
+    extension = os.path.splitext(path)[1]
+    if extension == ".onnx":
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+
+        def run(features):
+            return np.asarray(session.run(None, {input_name: features})[0]).reshape(-1)
+    elif extension in (".joblib", ".pkl"):
+        import warnings
+        import joblib
+
+        model = joblib.load(path)
+        # Estimators fitted on a DataFrame warn on every call that gets a plain array
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+        def run(features):
+            return np.asarray(model.predict(features)).reshape(-1)
+    else:
+        raise ValueError(f"Unsupported model format: {path}")
+    return run
+
+
+class SupplyChainInferenceEngine:
+    # Serves predictions from a saved model. Callers block in predict() while a single worker thread runs
+    # everything queued in the meantime as one vectorized call (up to max_batch_size rows, waiting at most
+    # max_wait_ms for more to arrive), so concurrent requests share the per-call overhead of the runtime.
+    #
+    # The model is loaded by the worker on first use. Every check_interval seconds it stats the model file
+    # and, if the file was replaced, loads the new one and swaps it in between two batches; a file that
+    # fails to load is logged and the previous model keeps serving.
+    def __init__(self, model_path=None, max_batch_size=None, max_wait_ms=None, check_interval=None,
+                 feature_store=None):
+        self.model_path = model_path or MLConfig.ML_MODEL_PATH
+        self.max_batch_size = max_batch_size or MLConfig.ML_BATCH_MAX_SIZE
+        self.max_wait = (MLConfig.ML_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.check_interval = MLConfig.ML_MODEL_CHECK_INTERVAL if check_interval is None else check_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._run = None
+        self._model_stamp = None
+        self._failed_stamp = None
+        self._next_check = 0.0
+        self._load_error = None
+        self._loads = 0
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._busy_seconds = 0.0
+        self.feature_store = feature_store
+        self._next_store_check = 0.0
+        self._store_rebuild = None
+
+    def predict(self, rows):
+        # rows is a sequence of feature rows (FEATURE_COLUMNS order); returns one float per row
+        import numpy as np
+
+        features = np.asarray(rows, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS))
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise ModelUnavailableError("The inference engine has been shut down")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._serve, name="inference", daemon=True)
+                self._thread.start()
+            self._queue.put((features, future))
+        return future.result()
+
+    def predict_transactions(self, transaction_ids):
+        # Predictions for transactions already in the database, with their features read from the feature
+        # store instead of sent by the caller. Returns the matching store rows (a transaction has one row per
+        # row of the training join) and one prediction per row.
+        import numpy as np
+
+        if self.feature_store is None:
+            raise ModelUnavailableError("The inference engine has no feature store")
+        self._refresh_feature_store(max(transaction_ids))
+        rows = self.feature_store.lookup(transaction_ids)
+        if rows is None:
+            raise ModelUnavailableError("The feature store has not been built yet")
+        if not len(rows["transaction_id"]):
+            return rows, []
+        return rows, self.predict(np.column_stack([rows[name] for name in FEATURE_COLUMNS]))
+
+    def _refresh_feature_store(self, transaction_id):
+        # Rows appended since the last look are added in the request (cost proportional to the new rows);
+        # anything that needs a full rebuild runs in a background thread while the current rows keep serving
+        now = time.monotonic()
+        high_water_mark = self.feature_store.high_water_mark()
+        if high_water_mark is not None and transaction_id <= high_water_mark and now < self._next_store_check:
+            return
+        self._next_store_check = now + MLConfig.ML_FEATURE_STORE_CHECK_INTERVAL
+        rebuilding = self._store_rebuild is not None and self._store_rebuild.is_alive()
+        if high_water_mark is None:
+            # Nothing to serve yet, so the first build has to be waited for
+            if not rebuilding:
+                self.feature_store.refresh()
+            return
+        if rebuilding or self.feature_store.refresh(rebuild=False, blocking=False)["action"] != "stale":
+            return
+        with self._lock:
+            if self._store_rebuild is None or not self._store_rebuild.is_alive():
+                self._store_rebuild = threading.Thread(target=self.feature_store.refresh, name="feature-store",
+                                                       daemon=True)
+                self._store_rebuild.start()
+
+    def _collect_batch(self, first):
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            rows += len(item[0])
+        return batch, False
+
+    def _serve(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stop = self._collect_batch(item)
+            self._run_batch(batch)
+            if stop:
+                break
+
+    def _run_batch(self, batch):
+        import numpy as np
+
+        try:
+            run = self._current_model()
+            start = time.perf_counter()
+            features = batch[0][0] if len(batch) == 1 else np.concatenate([features for features, _ in batch])
+            predictions = run(features).tolist()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._rows += len(predictions)
+            self._largest_batch = max(self._largest_batch, len(predictions))
+            self._busy_seconds += time.perf_counter() - start
+        offset = 0
+        for features, future in batch:
+            future.set_result(predictions[offset:offset + len(features)])
+            offset += len(features)
+
+    def _current_model(self):
+        # Only the worker thread loads models, so requests never wait on a reload beyond the current batch.
+        # A file that failed to load is not retried until it changes again.
+        now = time.monotonic()
+        if self._run is None or now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                info = os.stat(self.model_path)
+                stamp = (info.st_ino, info.st_mtime_ns, info.st_size)
+                if stamp != self._model_stamp and stamp != self._failed_stamp:
+                    try:
+                        run = load_model(self.model_path)
+                    except Exception:
+                        self._failed_stamp = stamp
+                        raise
+                    with self._lock:
+                        self._run = run
+                        self._model_stamp = stamp
+                        self._load_error = None
+                        self._loads += 1
+            except Exception as e:
+                self._load_error = str(e)
+                if self._run is not None:
+                    logging.warning("Keeping the current model; loading %s failed: %s", self.model_path, e)
+        if self._run is None:
+            raise ModelUnavailableError(f"No model could be loaded from {self.model_path}: {self._load_error}")
+        return self._run
+
+    def reload(self):
+        # Makes the worker look at the model file again before its next batch
+        self._next_check = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model_path": self.model_path,
+                "loaded": self._run is not None,
+                "loads": self._loads,
+                "load_error": self._load_error,
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "requests": self._requests,
+                "rows": self._rows,
+                "largest_batch": self._largest_batch,
+                "avg_batch": self._requests / self._batches if self._batches else 0.0,
+                "avg_batch_us": self._busy_seconds / self._batches * 1e6 if self._batches else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            self._queue.put(_STOP)
+        if thread is not None:
+            thread.join()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_inference_engine():
+    # Creating the engine is cheap: the worker thread, the model and the feature store are only touched by the
+    # first prediction
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SupplyChainInferenceEngine(feature_store=FeatureStore(DatabaseConfig.DB_CONFIG['sqlite']))
+    return _engine
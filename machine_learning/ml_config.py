@@ -0,0 +1,34 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class MLConfig:
+    # Rows read from SQLite per chunk while loading training data; only one chunk of raw rows is held at a time
+    ML_CHUNK_SIZE = int(os.getenv('ML_CHUNK_SIZE', '100000'))
+    # Converted columns are spilled here and reused while the source tables are unchanged ('' disables the cache)
+    ML_CACHE_DIR = os.getenv('ML_CACHE_DIR', 'machine_learning/cache')
+
+    # Model served by SupplyChainInferenceEngine (/predict): .onnx runs on onnxruntime, .joblib/.pkl on scikit-learn
+    ML_MODEL_PATH = os.getenv('ML_MODEL_PATH', 'machine_learning/models/psct.onnx')
+    # Requests queued while a batch runs are scored together, up to this many rows per call; the worker waits
+    # up to ML_BATCH_MAX_WAIT_MS for more to arrive (0 takes only what is already queued)
+    ML_BATCH_MAX_SIZE = int(os.getenv('ML_BATCH_MAX_SIZE', '256'))
+    ML_BATCH_MAX_WAIT_MS = float(os.getenv('ML_BATCH_MAX_WAIT_MS', '0'))
+    # How often the worker checks whether the model file was replaced
+    ML_MODEL_CHECK_INTERVAL = float(os.getenv('ML_MODEL_CHECK_INTERVAL', '1'))
+
+    # Model search run by the training driver: the candidate models (names from model_search.CANDIDATE_GRID),
+    # the number of cross-validation folds and the size of the joblib process pool (-1 uses every CPU)
+    ML_SEARCH_MODELS = os.getenv('ML_SEARCH_MODELS', 'linear,ridge,lasso,elasticnet')
+    ML_CV_FOLDS = int(os.getenv('ML_CV_FOLDS', '5'))
+    ML_N_JOBS = int(os.getenv('ML_N_JOBS', '-1'))
+
+    # Least-squares statistics and high-water mark kept between incremental training runs
+    ML_TRAINING_STATE = os.getenv('ML_TRAINING_STATE', 'machine_learning/models/psct_state.npz')
+
+    # Precomputed numeric features per transaction, shared by training and /predict/transaction
+    ML_FEATURE_STORE_DIR = os.getenv('ML_FEATURE_STORE_DIR', 'machine_learning/feature_store')
+    # How often the inference path checks the database for rows the feature store does not cover yet
+    ML_FEATURE_STORE_CHECK_INTERVAL = float(os.getenv('ML_FEATURE_STORE_CHECK_INTERVAL', '5'))
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import time
+
+from machine_learning.ml_config import MLConfig
+
+# Candidate models: name -> (scikit-learn estimator, parameter grid). Every combination in a grid is one
+# candidate; all of them are linear so the winner can still be exported to ONNX.
+CANDIDATE_GRID = {
+    "linear": ("sklearn.linear_model.LinearRegression", {}),
+    "ridge": ("sklearn.linear_model.Ridge", {"alpha": [0.1, 1.0, 10.0, 100.0]}),
+    "lasso": ("sklearn.linear_model.Lasso", {"alpha": [0.01, 0.1, 1.0]}),
+    "elasticnet": ("sklearn.linear_model.ElasticNet", {"alpha": [0.1, 1.0], "l1_ratio": [0.2, 0.8]}),
+}
+
+
+def make_estimator(class_path, params):
+    import importlib
+
+    module_name, class_name = class_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)(**params)
+
+
+def candidates(names=None):
+    # (name, class path, params) for every grid point of the named models
+    from sklearn.model_selection import ParameterGrid
+
+    names = names or [name.strip() for name in MLConfig.ML_SEARCH_MODELS.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CANDIDATE_GRID]
+    if unknown:
+        raise ValueError(f"Unknown candidate models: {', '.join(unknown)}. Choose from: {', '.join(CANDIDATE_GRID)}")
+    return [(name, CANDIDATE_GRID[name][0], params)
+            for name in names for params in ParameterGrid(CANDIDATE_GRID[name][1])]
+
+
+def _fit_fold(class_path, params, features, target, fold, folds):
+    # Runs in a worker process. features and target arrive as read-only memory maps, so only the file
+    # names were pickled; the training rows are gathered here, in the worker.
+    import numpy as np
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    bounds = np.linspace(0, len(target), folds + 1).astype(np.int64)
+    test = slice(bounds[fold], bounds[fold + 1])
+    train = np.r_[0:bounds[fold], bounds[fold + 1]:len(target)]
+    estimator = make_estimator(class_path, params)
+    estimator.fit(features[train], target[train])
+    score = estimator.score(features[test], target[test])
+    return float(score), time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def _memmap(folder, name, data):
+    # Writes a DataFrame, Series or array to folder/name.npy as float64, one column at a time so no
+    # second in-memory copy of the whole matrix is made, and maps it back read-only
+    import numpy as np
+
+    if hasattr(data, "columns"):
+        columns = [data[column].to_numpy() for column in data.columns]
+        shape = (len(data), len(columns))
+    else:
+        data = np.asarray(data)
+        columns = None
+        shape = data.shape
+    path = os.path.join(folder, f"{name}.npy")
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=shape)
+    if columns is None:
+        array[...] = data
+    else:
+        for position, column in enumerate(columns):
+            array[:, position] = column
+    array.flush()
+    del array
+    return np.load(path, mmap_mode="r")
+
+
+def search(features, target, names=None, folds=None, n_jobs=None):
+    # Scores every candidate with K-fold cross-validation (contiguous folds, the same split cross_val_score
+    # uses for regressors) and refits the best one on all rows. Each (candidate, fold) pair is one task
+    # on a joblib process pool.
+    #
+    # Returns the refitted best estimator, one result dict per candidate (mean/std R^2 plus the wall-clock
+    # and CPU seconds its folds took) and a summary with the elapsed wall-clock and total CPU time.
+    import numpy as np
+    from joblib import Parallel, delayed
+
+    folds = folds or MLConfig.ML_CV_FOLDS
+    n_jobs = n_jobs or MLConfig.ML_N_JOBS
+    grid = candidates(names)
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix="psct-search-") as folder:
+        # Workers map these files instead of each receiving a pickled copy of the matrix. joblib's own
+        # automatic memmapping (max_nbytes) is switched off since it would only write them again.
+        shared_features = _memmap(folder, "features", features)
+        shared_target = _memmap(folder, "target", target)
+        outcomes = Parallel(n_jobs=n_jobs, max_nbytes=None)(
+            delayed(_fit_fold)(class_path, params, shared_features, shared_target, fold, folds)
+            for _, class_path, params in grid for fold in range(folds)
+        )
+        search_seconds = time.perf_counter() - start
+
+        results = []
+        for position, (name, class_path, params) in enumerate(grid):
+            scores, walls, cpus = zip(*outcomes[position * folds:(position + 1) * folds])
+            results.append({
+                "name": name,
+                "class_path": class_path,
+                "params": params,
+                "mean_score": float(np.mean(scores)),
+                "std_score": float(np.std(scores)),
+                "wall_seconds": sum(walls),
+                "cpu_seconds": sum(cpus),
+            })
+        del shared_features, shared_target
+
+    # The winner is refitted on the caller's features so a DataFrame's column names stay attached to it
+    best = max(results, key=lambda result: result["mean_score"])
+    refit_start = time.perf_counter()
+    model = make_estimator(best["class_path"], best["params"])
+    model.fit(features, target)
+    refit_seconds = time.perf_counter() - refit_start
+
+    summary = {
+        "candidates": len(grid),
+        "tasks": len(outcomes),
+        "n_jobs": n_jobs,
+        "wall_seconds": search_seconds,
+        "cpu_seconds": sum(result["cpu_seconds"] for result in results),
+        "refit_seconds": refit_seconds,
+        "best": best,
+    }
+    return model, results, summary
+
+
+def format_results(results, summary):
+    lines = [f"{'candidate':<40} {'mean R^2':>10} {'std':>8} {'wall s':>8} {'cpu s':>8}"]
+    for result in sorted(results, key=lambda result: -result["mean_score"]):
+        label = result["name"] + "".join(f" {key}={value}" for key, value in sorted(result["params"].items()))
+        lines.append(f"{label:<40} {result['mean_score']:>10.6f} {result['std_score']:>8.4f} "
+                     f"{result['wall_seconds']:>8.3f} {result['cpu_seconds']:>8.3f}")
+    # Fold wall time summed over the workers against the elapsed time is how many folds ran at once; CPU time
+    # against the elapsed time is how many cores that actually kept busy
+    task_wall = sum(result["wall_seconds"] for result in results)
+    elapsed = summary["wall_seconds"] or float("inf")
+    lines.append(f"{summary['candidates']} candidates x {summary['tasks'] // max(summary['candidates'], 1)} folds "
+                 f"on n_jobs={summary['n_jobs']}: {summary['wall_seconds']:.2f}s elapsed, "
+                 f"{task_wall:.2f}s fold wall time ({task_wall / elapsed:.1f}x concurrency), "
+                 f"{summary['cpu_seconds']:.2f}s CPU ({summary['cpu_seconds'] / elapsed:.1f}x cores busy); "
+                 f"refit {summary['refit_seconds']:.2f}s")
+    return "\n".join(lines)
@@ -1,16 +1,15 @@
+import os
 import pickle
-import sqlite3
-
-import joblib
-import onnx
-import pandas as pd
-from skl2onnx import convert_sklearn
-from skl2onnx.common.data_types import FloatTensorType
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.model_selection import cross_val_score
-from sklearn.model_selection import train_test_split
+
 from log_config.logging_config import logging_config
+from machine_learning.data_loader import load_training_frame
+from machine_learning.feature_store import FeatureStore
+from machine_learning.incremental import update_statistics
+from machine_learning.ml_config import MLConfig
+from machine_learning.model_search import format_results, search
+
+# pandas, scikit-learn, joblib and the ONNX converters are imported inside the methods that need them so
+# that importing this module (e.g. from the API process) stays cheap
 
 
 class SupplyChainPredictor:
@@ -24,46 +23,11 @@ class SupplyChainPredictor:
         self.model = None
         self.spinner = logging_config.initialize_spinner()
 
-    def load_data(self):
+    def load_data(self, chunksize=None, use_cache=True):
         self.spinner.start("Loading data...")  # Start the spinner
-        conn = sqlite3.connect(self.db_file)
-        query = """
-            SELECT transactions.quantity AS trans_quantity, inventory.quantity AS inventory_quantity, 
-                   suppliers.name AS supplier_name, customers.name AS customer_name, 
-                   products.product_id, products.name AS product_name, products.description, 
-                   products.price, shipments.shipment_date, shipments.expected_delivery_date
-            FROM transactions
-            JOIN suppliers ON transactions.supplier_id = suppliers.id
-            JOIN customers ON transactions.customer_id = customers.id
-            JOIN products ON transactions.product_id = products.product_id
-            JOIN inventory ON transactions.product_id = inventory.product_id
-            JOIN shipments ON transactions.id = shipments.id
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        self.spinner.succeed("Data loaded successfully")
-
-        # Data cleaning
-        print(df)  # Print DataFrame before cleaning
-        df['trans_quantity'] = pd.to_numeric(df['trans_quantity'], errors='coerce')
-        print(df)  # Print DataFrame after converting 'trans_quantity' to numeric
-        df['inventory_quantity'] = pd.to_numeric(df['inventory_quantity'], errors='coerce')
-        print(df)  # Print DataFrame after converting 'inventory_quantity' to numeric
-        df['price'] = pd.to_numeric(df['price'], errors='coerce')
-        print(df)  # Print DataFrame after converting 'price' to numeric
-        df['shipment_date'] = pd.to_datetime(df['shipment_date'])
-        print(df)  # Print DataFrame after converting 'shipment_date' to datetime
-        df['expected_delivery_date'] = pd.to_datetime(df['expected_delivery_date'])
-        print(df)  # Print DataFrame after converting 'expected_delivery_date' to datetime
-        df['shipment_duration'] = (df['expected_delivery_date'] - df['shipment_date']).dt.days
-        print(df)  # Print DataFrame after calculating 'shipment_duration'
-        df.drop(['shipment_date', 'expected_delivery_date'], axis=1, inplace=True)
-        print(df)  # Print DataFrame after dropping 'shipment_date' and 'expected_delivery_date'
-        df.fillna(0, inplace=True)
-        print(df)  # Print DataFrame after filling missing values
-
-        # Fill missing values with a default value (e.g., 0 for numeric columns)
-        df.fillna(0, inplace=True)
+        df, cached = load_training_frame(self.db_file, chunksize or MLConfig.ML_CHUNK_SIZE,
+                                         MLConfig.ML_CACHE_DIR if use_cache else None)
+        self.spinner.succeed(f"Loaded {len(df)} rows" + (" from the column cache" if cached else ""))
 
         if df.empty:
             raise ValueError("The DataFrame is empty after data cleaning")
@@ -73,9 +37,30 @@ class SupplyChainPredictor:
 
         return df
 
+    def load_features(self):
+        # The numeric columns only (what prepare_data trains on), indexed by transaction id and read from the
+        # feature store, which is first brought up to date: unchanged data costs a handful of MAX(id) lookups,
+        # appended transactions cost only their own rows
+        self.spinner.start("Loading features...")  # Start the spinner
+        store = FeatureStore(self.db_file)
+        result = store.refresh()
+        df = store.frame()
+        self.spinner.succeed(f"Feature store {result['action']} ({result['rows']} rows added in "
+                             f"{result['seconds']:.2f}s), {len(df)} rows")
+
+        if df.empty:
+            raise ValueError("The feature store is empty")
+
+        if self.target_column not in df.columns:
+            raise ValueError(f"Column '{self.target_column}' not found in DataFrame")
+
+        return df
+
     def prepare_data(self, df):
+        from sklearn.model_selection import train_test_split
+
         self.spinner.start("Preparing data...")  # Start the spinner
-        numeric_columns = df.select_dtypes(include=['int64', 'float64']).columns
+        numeric_columns = df.select_dtypes(include='number').columns
         if self.target_column in numeric_columns:
             self.features_train, self.features_test, self.target_train, self.target_test = \
                 train_test_split(df[numeric_columns].drop(self.target_column, axis=1), df[self.target_column],
@@ -85,6 +70,8 @@ class SupplyChainPredictor:
         self.spinner.succeed("Data prepared successfully")
 
     def train_model(self):
+        from sklearn.linear_model import LinearRegression
+
         self.spinner.start("Training model...")  # Start the spinner
         self.model = LinearRegression()
         self.model.fit(self.features_train, self.target_train)
@@ -94,7 +81,39 @@ class SupplyChainPredictor:
 
         self.spinner.succeed("Model trained successfully")
 
+    def search_models(self, names=None, folds=None, n_jobs=None):
+        # Cross-validates every candidate in the model grid in parallel and keeps the best one, refitted on
+        # the whole training set, as self.model
+        self.spinner.start("Searching models...")  # Start the spinner
+        self.model, results, summary = search(self.features_train, self.target_train, names, folds, n_jobs)
+        best = summary["best"]
+        self.spinner.succeed(f"Selected {best['name']} {best['params']} (mean R^2 {best['mean_score']:.6f})")
+        print(format_results(results, summary))
+        return results, summary
+
+    def train_incremental(self, state_path=None, chunksize=None):
+        # Brings the linear model up to date with the transactions appended since the previous call, using
+        # the least-squares statistics saved in state_path; the first call, or one after rows other than new
+        # transactions were added, reads every row. Unlike train_model there is no train/test split: every row
+        # is used.
+        self.spinner.start("Updating model...")  # Start the spinner
+        stats, report = update_statistics(self.db_file, self.target_column, state_path or MLConfig.ML_TRAINING_STATE,
+                                          chunksize or MLConfig.ML_CHUNK_SIZE)
+        if not stats.rows:
+            raise ValueError("No rows to train on")
+        self.model = stats.to_estimator()
+        self.spinner.succeed(f"Added {report['rows']} rows ({report['total_rows']} in total, up to transaction "
+                             f"{report['high_water_mark']}) in {report['seconds']:.2f}s")
+        if report["rebuilt"]:
+            print(f"Rebuilt the statistics from every row: {report['rebuilt']}")
+        if report["delta_mse"] is not None:
+            print(f"Previous model on the new rows: Mean Squared Error {report['delta_mse']}, "
+                  f"Mean Absolute Error {report['delta_mae']}")
+        return report
+
     def evaluate_model(self):
+        from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+
         self.spinner.start("Evaluating model...")  # Start the spinner
         predictions = self.model.predict(self.features_test)
         mse = mean_squared_error(self.target_test, predictions)
@@ -110,40 +129,44 @@ class SupplyChainPredictor:
         if file_format not in ['pkl', 'joblib', 'onnx']:
             raise ValueError("Invalid file format. Choose one of: 'pkl', 'joblib', 'onnx'")
 
+        # Written next to the target and renamed over it, so a running inference engine never loads a
+        # half-written file
+        path = f'machine_learning/models/psct.{file_format}'
+        tmp_path = f'{path}.tmp'
         if file_format == 'pkl':
-            with open('machine_learning/models/psct.pkl', 'wb') as f:
+            with open(tmp_path, 'wb') as f:
                 pickle.dump(self.model, f)
         elif file_format == 'joblib':
-            joblib.dump(self.model, 'machine_learning/models/psct.joblib')
+            import joblib
+
+            joblib.dump(self.model, tmp_path)
         elif file_format == 'onnx':
-            initial_type = [('float_input', FloatTensorType([None, self.features_train.shape[1]]))]
+            import onnx
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+
+            initial_type = [('float_input', FloatTensorType([None, self.model.n_features_in_]))]
             onnx_model = convert_sklearn(self.model, initial_types=initial_type)
-            onnx.save_model(onnx_model, 'machine_learning/models/psct.onnx')
+            onnx.save_model(onnx_model, tmp_path)
+        os.replace(tmp_path, path)
 
         print(f"Model saved as 'model.{file_format}'")
         self.spinner.succeed("Model saved successfully")
 
 
 if __name__ == "__main__":
+    logging_config.configure()
+
     # Initialize SupplyChainPredictor
     predictor = SupplyChainPredictor(db_file='supply_chain.db', target_column='trans_quantity')
 
     try:
         # Load and prepare data
-        data = predictor.load_data()
+        data = predictor.load_features()
         predictor.prepare_data(data)
 
-        # Train the model
-        predictor.train_model()
-
-        # Perform cross-validation
-        scores = cross_val_score(predictor.model, predictor.features_train, predictor.target_train, cv=5)
-
-        # Print the scores
-        print('Cross-validation scores: ', scores)
-
-        # Print the average score
-        print('Average cross-validation score: ', scores.mean())
+        # Cross-validate the candidate models in parallel and keep the best one
+        predictor.search_models()
 
         # Evaluate the model
         predictor.evaluate_model()
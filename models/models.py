@@ -78,3 +78,13 @@ transaction_model = api.model(
                                                 example="2022-12-10"),
     },
 )
+
+prediction_model = api.model(
+    "Prediction",
+    {
+        "inventory_quantity": fields.Integer(required=True, description="The inventory quantity", example=100),
+        "price": fields.Float(required=True, description="The price of the product", example=100.0),
+        "shipment_duration": fields.Integer(required=True, description="Days from shipment to expected delivery",
+                                            example=9),
+    },
+)
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from database.db import SCHEMA
+from machine_learning.batch_scoring import SCORING_QUERY, _windows
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(":memory:")
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.execute("INSERT INTO suppliers (id, name, address) VALUES (1, 's', 'a')")
+    connection.execute("INSERT INTO customers (id, name, address) VALUES (1, 'c', 'a')")
+    for code in ("PROD01", "PROD02"):
+        connection.execute("INSERT INTO products (product_id, name, description, price) VALUES (?, 'n', 'd', 1.0)",
+                           (code,))
+    # PROD02 fans out to five inventory rows, PROD01 to one
+    connection.executemany("INSERT INTO inventory (product_id, quantity) VALUES (?, 1)",
+                           [("PROD01",)] + [("PROD02",)] * 5)
+    for transaction_id in range(1, 41):
+        code = "PROD02" if transaction_id % 4 == 0 else "PROD01"
+        connection.execute("INSERT INTO transactions (id, product_id, transaction_detail, supplier_id, customer_id, "
+                           "quantity, shipment_date, expected_delivery_date) "
+                           "VALUES (?, ?, 'd', 1, 1, 1, '2024-01-01', '2024-01-05')", (transaction_id, code))
+        connection.execute("INSERT INTO shipments (id, supplier_id, customer_id, product_id, quantity, shipment_date, "
+                           "expected_delivery_date) VALUES (?, 1, 1, ?, 1, '2024-01-01', '2024-01-05')",
+                           (transaction_id, code))
+    yield connection
+    connection.close()
+
+
+def _join_rows(conn, low, high):
+    return len(conn.execute(SCORING_QUERY, (low, high)).fetchall())
+
+
+@pytest.mark.parametrize("max_rows", [1, 5, 7, 16, 1000])
+def test_windows_cover_every_transaction_within_the_row_cap(conn, max_rows):
+    windows = list(_windows(conn, 0, 40, max_rows))
+
+    assert windows[0][0] == 0 and windows[-1][1] == 40
+    assert all(previous[1] == following[0] for previous, following in zip(windows, windows[1:]))
+    # A transaction with more join rows than the cap is the only thing allowed to exceed it
+    for low, high in windows:
+        assert _join_rows(conn, low, high) <= max_rows or high - low == 1
+    assert sum(_join_rows(conn, low, high) for low, high in windows) == _join_rows(conn, 0, 40) == 30 + 10 * 5
+
+
+def test_windows_start_after_the_given_id(conn):
+    windows = list(_windows(conn, 30, 40, 6))
+
+    assert windows[0][0] == 30 and windows[-1][1] == 40
+    assert sum(_join_rows(conn, low, high) for low, high in windows) == 7 + 3 * 5
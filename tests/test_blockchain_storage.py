@@ -0,0 +1,197 @@
+import glob
+import os
+import threading
+
+import pytest
+
+from blockchain.blockchain import HASH_SIZE, Blockchain, decode_block, encode_block
+from blockchain.storage import INDEX_ENTRY, SEGMENT_MAGIC, SegmentBlockStorage, StorageError, fcntl
+
+BLOCKS = 30
+
+
+def _open(directory, **kwargs):
+    # Small segments, so the chain spans several files and only the newest one is recovered
+    return SegmentBlockStorage(str(directory), encode_block, decode_block, segment_max_bytes=1024, **kwargs)
+
+
+def _hashes(storage):
+    return [bytes(raw[-HASH_SIZE:]) for raw in storage.iter_raw()]
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    # A closed ledger of BLOCKS blocks (genesis included) and the hash of each block
+    storage = _open(tmp_path)
+    chain = Blockchain(storage)
+    for number in range(BLOCKS - 1):
+        chain.add_block({"transaction": number})
+    hashes = _hashes(storage)
+    storage.close()
+    assert len(hashes) == BLOCKS
+    return tmp_path, hashes
+
+
+def _newest_segment(directory):
+    data_path = sorted(glob.glob(os.path.join(directory, "segment-*.log")))[-1]
+    return data_path, data_path[:-len(".log")] + ".idx"
+
+
+def _reopen(directory):
+    storage = _open(directory)
+    try:
+        return _hashes(storage), os.path.getsize(_newest_segment(directory)[1]) // INDEX_ENTRY.size
+    finally:
+        storage.close()
+
+
+def test_ledger_spans_several_segments(ledger):
+    directory, _ = ledger
+
+    assert len(glob.glob(os.path.join(directory, "segment-*.log"))) > 1
+
+
+def test_torn_record_is_dropped(ledger):
+    directory, hashes = ledger
+    data_path, index_path = _newest_segment(directory)
+    entries = os.path.getsize(index_path) // INDEX_ENTRY.size
+    os.truncate(data_path, os.path.getsize(data_path) - 5)
+
+    recovered, indexed = _reopen(directory)
+
+    assert recovered == hashes[:-1]
+    # The index entry of the torn record is dropped with it
+    assert indexed == entries - 1
+
+
+def test_torn_record_header_is_dropped(ledger):
+    directory, hashes = ledger
+    data_path, index_path = _newest_segment(directory)
+    with open(index_path, "rb") as index:
+        index.seek(-INDEX_ENTRY.size, os.SEEK_END)
+        (last_offset,) = INDEX_ENTRY.unpack(index.read())
+    # Only two bytes of the last record's length prefix made it to disk
+    os.truncate(data_path, last_offset + 2)
+
+    recovered, _ = _reopen(directory)
+
+    assert recovered == hashes[:-1]
+    assert os.path.getsize(data_path) == last_offset
+
+
+def test_ledger_appends_after_recovering_a_torn_tail(ledger):
+    directory, hashes = ledger
+    data_path, _ = _newest_segment(directory)
+    os.truncate(data_path, os.path.getsize(data_path) - 5)
+
+    storage = _open(directory)
+    chain = Blockchain(storage)
+    block = chain.add_block({"transaction": "after recovery"})
+    storage.close()
+
+    recovered, _ = _reopen(directory)
+    assert recovered == hashes[:-1] + [block.block_hash]
+    assert block.previous_hash == hashes[-2]
+
+
+def test_deleted_index_is_rebuilt_from_the_log(ledger):
+    directory, hashes = ledger
+    _, index_path = _newest_segment(directory)
+    entries = os.path.getsize(index_path) // INDEX_ENTRY.size
+    os.remove(index_path)
+
+    recovered, indexed = _reopen(directory)
+
+    assert recovered == hashes
+    assert indexed == entries
+
+
+def test_missing_index_entries_are_rebuilt(ledger):
+    # Records whose index entries never reached the disk are indexed again
+    directory, hashes = ledger
+    _, index_path = _newest_segment(directory)
+    entries = os.path.getsize(index_path) // INDEX_ENTRY.size
+    os.truncate(index_path, INDEX_ENTRY.size)
+
+    recovered, indexed = _reopen(directory)
+
+    assert recovered == hashes
+    assert indexed == entries
+
+
+def test_torn_index_entry_is_dropped(ledger):
+    directory, hashes = ledger
+    _, index_path = _newest_segment(directory)
+    with open(index_path, "ab") as index:
+        index.write(b"\x00\x01\x02")
+
+    recovered, _ = _reopen(directory)
+
+    assert recovered == hashes
+
+
+def test_index_entry_past_the_log_is_dropped(ledger):
+    # The index reached the disk before the data it points at
+    directory, hashes = ledger
+    data_path, index_path = _newest_segment(directory)
+    with open(index_path, "ab") as index:
+        index.write(INDEX_ENTRY.pack(os.path.getsize(data_path) + 100))
+
+    recovered, _ = _reopen(directory)
+
+    assert recovered == hashes
+
+
+def test_foreign_file_is_refused(ledger):
+    directory, _ = ledger
+    data_path, _ = _newest_segment(directory)
+    with open(data_path, "r+b") as data:
+        data.write(b"X" * len(SEGMENT_MAGIC))
+
+    with pytest.raises(StorageError):
+        _open(directory)
+
+
+def test_read_only_storage_refuses_writes(ledger):
+    directory, hashes = ledger
+    sizes = {path: os.path.getsize(path) for path in glob.glob(os.path.join(directory, "segment-*"))}
+    storage = _open(directory, read_only=True)
+    try:
+        assert _hashes(storage) == hashes
+        with pytest.raises(StorageError):
+            storage.append(storage[-1])
+    finally:
+        storage.close()
+
+    assert {path: os.path.getsize(path) for path in sizes} == sizes
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock is not available on this platform")
+def test_lock_is_exclusive_between_storages_on_one_directory(ledger):
+    # Each storage has its own lock file handle, as separate worker processes would
+    directory, hashes = ledger
+    first = _open(directory)
+    second = _open(directory)
+    acquired = threading.Event()
+
+    def take_second_lock():
+        with second.lock():
+            acquired.set()
+
+    try:
+        with first.lock():
+            waiter = threading.Thread(target=take_second_lock)
+            waiter.start()
+            assert not acquired.wait(0.2)
+        assert acquired.wait(5)
+        waiter.join()
+
+        # Blocks appended through one storage are seen by the other after a refresh
+        block = Blockchain(first).add_block({"transaction": "shared"})
+        with second.lock():
+            second.refresh()
+        assert _hashes(second) == hashes + [block.block_hash]
+    finally:
+        first.close()
+        second.close()
+
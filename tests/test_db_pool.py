@@ -0,0 +1,28 @@
+import sqlite3
+
+import pytest
+
+from database.db_pool import ConnectionPool
+
+
+def test_failed_reconnect_frees_the_slot(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.1)
+    connection = pool.acquire()
+    pool.release(connection)
+    # The idle connection fails its health check and the replacement cannot be opened
+    connection.close()
+    connect = pool.connect
+
+    def refuse():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(pool, "connect", refuse)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    assert pool.stats()["open"] == 0
+
+    monkeypatch.setattr(pool, "connect", connect)
+    with pool.connection() as connection:
+        assert connection.execute("SELECT 1").fetchone() == (1,)
+    assert pool.stats()["open"] == 1
+    pool.close()
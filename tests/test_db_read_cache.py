@@ -0,0 +1,39 @@
+import pytest
+
+from database.db import SupplyChainDatabase
+from database.db_config import DatabaseConfig
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setitem(DatabaseConfig.DB_CONFIG, "sqlite", str(tmp_path / "supply_chain.db"))
+    monkeypatch.setattr(DatabaseConfig, "DB_STORAGE_MODE", "default")
+    monkeypatch.setattr(DatabaseConfig, "DB_READ_CACHE_MAX_ROWS", 1000)
+    database = SupplyChainDatabase()
+    database.create_database()
+    database.insert_product({"product_id": "PROD01", "name": "n", "description": "d", "price": 1.0})
+    database.insert_inventory({"product_id": "PROD01", "quantity": 7})
+    yield database
+    database.close()
+
+
+def test_products_and_inventory_reads_do_not_share_cache_entries(db):
+    products = db.get_all_products()
+    products_page = db.get_products_page_with_etag(0, 100)
+
+    assert db.get_inventory() == [(1, "PROD01", 7)]
+    assert db.get_inventory_page_with_etag(0, 100)[0] == [(1, "PROD01", 7)]
+    assert db.get_inventory_page_with_etag(0, 100)[1] != products_page[1]
+    assert db.get_all_products() == products == [(1, "PROD01", "n", "d", 1.0)]
+
+
+def test_insert_invalidates_only_its_own_table(db):
+    assert db.get_all_products() == [(1, "PROD01", "n", "d", 1.0)]
+    assert db.get_inventory_page(0, 100) == [(1, "PROD01", 7)]
+
+    db.insert_inventory({"product_id": "PROD01", "quantity": 3})
+
+    assert db.get_inventory_page(0, 100) == [(1, "PROD01", 7), (2, "PROD01", 3)]
+    assert db.get_inventory() == [(1, "PROD01", 7), (2, "PROD01", 3)]
+    assert db.get_inventory_by_product_id("PROD01") == [(1, "PROD01", 7), (2, "PROD01", 3)]
+    assert db.get_all_products() == [(1, "PROD01", "n", "d", 1.0)]
@@ -0,0 +1,72 @@
+import pytest
+
+from database.db import SupplyChainDatabase
+from database.db_config import DatabaseConfig
+from database.db_stock_levels import STOCK_LEVEL_COLUMNS, rebuild_stock_levels
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setitem(DatabaseConfig.DB_CONFIG, "sqlite", str(tmp_path / "supply_chain.db"))
+    monkeypatch.setattr(DatabaseConfig, "DB_STORAGE_MODE", "default")
+    database = SupplyChainDatabase()
+    database.create_database()
+    yield database
+    database.close()
+
+
+def _transaction(product_id, quantity):
+    return {"product_id": product_id, "transaction_detail": "Purchase", "supplier_id": 1, "customer_id": 1,
+            "quantity": quantity, "shipment_date": "2024-01-01", "expected_delivery_date": "2024-01-05"}
+
+
+def _shipment(product_id, quantity):
+    return {"supplier_id": 1, "customer_id": 1, "product_id": product_id, "quantity": quantity,
+            "shipment_date": "2024-01-01", "expected_delivery_date": "2024-01-05"}
+
+
+def _all_stock_levels(db):
+    with db.pool.connection() as connection:
+        rows = connection.execute(
+            "SELECT product_id, inventory_quantity - shipment_quantity, inventory_quantity, transaction_quantity, "
+            "shipment_quantity FROM stock_levels ORDER BY product_id"
+        ).fetchall()
+    return [dict(zip(STOCK_LEVEL_COLUMNS, row)) for row in rows]
+
+
+def test_maintained_stock_levels_match_a_rebuild(db):
+    db.insert_inventory({"product_id": "PROD01", "quantity": 50})
+    db.insert_inventory({"product_id": "PROD01", "quantity": 25})
+    db.insert_inventory_bulk([{"product_id": "PROD02", "quantity": 10}, {"product_id": "PROD03", "quantity": 4}])
+    db.insert_transaction(_transaction("PROD01", 7))
+    db.insert_shipment(_shipment("PROD01", 7))
+    db.insert_transactions_bulk([_transaction("PROD02", 3), _transaction("PROD02", 2)])
+    db.insert_shipments_bulk([_shipment("PROD02", 3)])
+
+    maintained = _all_stock_levels(db)
+    db.rebuild_stock_levels(chunk_size=2)
+
+    assert _all_stock_levels(db) == maintained
+    assert db.get_stock_level("PROD01") == {
+        "product_id": "PROD01", "on_hand": 68, "inventory_quantity": 75, "transaction_quantity": 7,
+        "shipment_quantity": 7,
+    }
+    # Ordered but not yet shipped: on_hand only drops once the shipment is recorded
+    assert db.get_stock_level("PROD02")["on_hand"] == 7
+    assert db.get_stock_level("PROD02")["transaction_quantity"] == 5
+
+
+def test_rebuild_counts_rows_written_around_the_database_class(db):
+    db.insert_inventory({"product_id": "PROD01", "quantity": 5})
+    with db.pool.connection() as connection:
+        connection.execute("INSERT INTO shipments (supplier_id, customer_id, product_id, quantity, shipment_date, "
+                           "expected_delivery_date) VALUES (1, 1, 'PROD01', 2, '2024-01-01', '2024-01-05')")
+        connection.commit()
+    assert db.get_stock_level("PROD01")["on_hand"] == 5
+
+    with db.pool.connection() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        rebuild_stock_levels(connection.cursor())
+        connection.commit()
+
+    assert db.get_stock_level("PROD01")["on_hand"] == 3
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database.db_writer import SQLiteWriter
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "writer.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    connection.close()
+    return path
+
+
+def _insert(item_id):
+    def operation(cursor):
+        cursor.execute("INSERT INTO items (id, name) VALUES (?, ?)", (item_id, f"item {item_id}"))
+        return item_id
+    return operation
+
+
+def _insert_then_fail(item_id):
+    # Writes a row and then hits a constraint violation; the row must not survive
+    def operation(cursor):
+        cursor.execute("INSERT INTO items (id, name) VALUES (?, ?)", (item_id, "partial"))
+        cursor.execute("INSERT INTO items (id, name) VALUES (?, NULL)", (item_id + 1,))
+    return operation
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_failing_operation_only_fails_its_own_future(db_file):
+    writer = SQLiteWriter(lambda: sqlite3.connect(db_file, check_same_thread=False), batch_size=64)
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold(cursor):
+        started.set()
+        return release.wait(5)
+
+    operations = [_insert(1), _insert(2), _insert_then_fail(100), _insert(3), _insert(4)]
+    try:
+        with ThreadPoolExecutor(len(operations) + 1) as pool:
+            # Holds the writer inside its first batch so every other operation queues up for the next one
+            blocker = pool.submit(writer.submit, hold)
+            assert started.wait(5)
+            futures = [pool.submit(writer.submit, operation) for operation in operations]
+            _wait_for(lambda: writer.stats()["queued"] == len(operations))
+            release.set()
+
+            assert blocker.result() is True
+            with pytest.raises(sqlite3.IntegrityError):
+                futures[2].result()
+            assert [future.result() for position, future in enumerate(futures) if position != 2] == [1, 2, 3, 4]
+        assert writer.stats()["batches"] == 2
+        assert writer.stats()["largest_batch"] == len(operations)
+    finally:
+        writer.close()
+
+    connection = sqlite3.connect(db_file)
+    try:
+        assert connection.execute("SELECT id FROM items ORDER BY id").fetchall() == [(1,), (2,), (3,), (4,)]
+    finally:
+        connection.close()
+
+
+def test_python_exception_is_isolated_too(db_file):
+    writer = SQLiteWriter(lambda: sqlite3.connect(db_file, check_same_thread=False))
+
+    def fail(cursor):
+        cursor.execute("INSERT INTO items (id, name) VALUES (10, 'partial')")
+        raise ValueError("rejected")
+
+    try:
+        with pytest.raises(ValueError, match="rejected"):
+            writer.submit(fail)
+        assert writer.submit(_insert(11)) == 11
+    finally:
+        writer.close()
+
+    connection = sqlite3.connect(db_file)
+    try:
+        assert connection.execute("SELECT id FROM items").fetchall() == [(11,)]
+    finally:
+        connection.close()
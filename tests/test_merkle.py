@@ -0,0 +1,110 @@
+import hashlib
+
+import pytest
+
+from blockchain.blockchain import Blockchain
+from blockchain.merkle import leaf_hash, merkle_proof, merkle_root, node_hash, verify_proof
+
+SIZES = [1, 2, 3, 5, 6, 7, 4, 8, 16, 32]
+
+
+def _reference_root(leaves):
+    # RFC 6962 section 2.1: MTH(D[n]) splits at the largest power of two smaller than n
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1
+    while split * 2 < len(leaves):
+        split *= 2
+    return hashlib.sha256(b"\x01" + _reference_root(leaves[:split]) + _reference_root(leaves[split:])).digest()
+
+
+def _leaves(size):
+    return [leaf_hash(f"transaction {number}".encode()) for number in range(size)]
+
+
+def test_leaves_and_nodes_use_distinct_prefixes():
+    left, right = leaf_hash(b"a"), leaf_hash(b"b")
+
+    assert leaf_hash(b"a") == hashlib.sha256(b"\x00a").digest()
+    assert node_hash(left, right) == hashlib.sha256(b"\x01" + left + right).digest()
+    # An inner node's input cannot be replayed as a leaf
+    assert leaf_hash(left + right) != node_hash(left, right)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_root_matches_rfc_6962(size):
+    leaves = _leaves(size)
+
+    assert merkle_root(leaves) == _reference_root(leaves)
+
+
+def test_odd_trees_do_not_collide_with_a_duplicated_last_leaf():
+    leaves = _leaves(3)
+
+    assert merkle_root(leaves) != merkle_root(leaves + leaves[-1:])
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_proof_verifies_at_every_position(size):
+    leaves = _leaves(size)
+    root = merkle_root(leaves)
+
+    for position, leaf in enumerate(leaves):
+        proof = merkle_proof(leaves, position)
+        assert verify_proof(leaf, proof, root)
+        # A proof is no longer than the tree is deep
+        assert len(proof) <= max(size - 1, 0).bit_length()
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_tampered_leaf_fails_verification(size):
+    leaves = _leaves(size)
+    root = merkle_root(leaves)
+
+    for position in range(size):
+        proof = merkle_proof(leaves, position)
+        assert not verify_proof(leaf_hash(b"forged"), proof, root)
+        # Every other leaf's hash is rejected at this position too
+        for other in range(size):
+            if other != position:
+                assert not verify_proof(leaves[other], proof, root)
+
+
+@pytest.mark.parametrize("size", [size for size in SIZES if size > 1])
+def test_tampered_sibling_fails_verification(size):
+    leaves = _leaves(size)
+    root = merkle_root(leaves)
+
+    for position, leaf in enumerate(leaves):
+        proof = merkle_proof(leaves, position)
+        for step, (sibling, side) in enumerate(proof):
+            forged = bytes([sibling[0] ^ 1]) + sibling[1:]
+            assert not verify_proof(leaf, proof[:step] + [(forged, side)] + proof[step + 1:], root)
+            flipped = "right" if side == "left" else "left"
+            assert not verify_proof(leaf, proof[:step] + [(sibling, flipped)] + proof[step + 1:], root)
+        # Dropping a step fails as well
+        assert not verify_proof(leaf, proof[:-1], root)
+
+
+def test_proof_position_out_of_range():
+    with pytest.raises(IndexError):
+        merkle_proof(_leaves(3), 3)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8])
+def test_block_proofs_verify_against_the_sealed_root(size):
+    chain = Blockchain()
+    transactions = [{"product_id": f"PROD{number:02d}", "quantity": number} for number in range(size)]
+    block = chain.seal_transactions(transactions)
+
+    for position in range(size):
+        proof = chain.get_merkle_proof(block.index, position)
+        assert proof["transaction"] == transactions[position]
+        assert proof["merkle_root"] == block.data["merkle_root"]
+        steps = [(bytes.fromhex(step["hash"]), step["side"]) for step in proof["proof"]]
+        assert verify_proof(bytes.fromhex(proof["leaf_hash"]), steps, bytes.fromhex(proof["merkle_root"]))
+
+    with pytest.raises(IndexError):
+        chain.get_merkle_proof(block.index, size)
+    with pytest.raises(ValueError):
+        chain.get_merkle_proof(0, 0)
@@ -0,0 +1,65 @@
+import pytest
+
+from api.validation_utils import ValidationError, Validator
+
+VALID = {
+    "product_id": "ABC123",
+    "transaction_detail": "Purchase",
+    "supplier_id": 1,
+    "customer_id": 2,
+    "quantity": 3,
+    "shipment_date": "2024-02-29",
+    "expected_delivery_date": "2024-03-01",
+}
+
+
+def _scalar_error(transaction):
+    try:
+        Validator.validate_transaction(transaction)
+    except ValidationError as e:
+        return str(e)
+    return None
+
+
+@pytest.mark.parametrize("field, value", [
+    ("product_id", "ABCDEF\n"),
+    ("product_id", "ABCDEF"),
+    ("product_id", "ABC12"),
+    ("product_id", "ABCDEFGHIJK"),
+    ("product_id", "ABC-12"),
+    ("shipment_date", "2024-01-01\n"),
+    ("shipment_date", "2023-02-29"),
+    ("shipment_date", "2024-1-01"),
+    ("quantity", -1),
+    ("quantity", 1.0),
+    ("transaction_detail", ""),
+])
+def test_bulk_validation_matches_validate_transaction(field, value):
+    transaction = {**VALID, field: value}
+    valid, errors, rows = Validator.validate_transactions_bulk([transaction])
+
+    expected = _scalar_error(transaction)
+    assert errors[0] == expected
+    assert bool(valid[0]) == (expected is None)
+
+
+def test_trailing_newline_is_rejected_by_both_paths():
+    transaction = {**VALID, "product_id": "ABCDEF\n"}
+
+    with pytest.raises(ValidationError):
+        Validator.validate_product_id("ABCDEF\n")
+    assert not Validator.validate_transactions_bulk([transaction])[0][0]
+
+
+@pytest.mark.parametrize("value", [True, False, float("nan"), float("inf"), -float("inf"), 10 ** 400, "1", None])
+def test_features_must_be_finite_numbers(value):
+    features = {"inventory_quantity": 5, "price": 9.5, "shipment_duration": value}
+
+    with pytest.raises(ValidationError, match="Invalid data"):
+        Validator.validate_features(features, ("inventory_quantity", "price", "shipment_duration"))
+
+
+def test_features_accept_ints_and_floats():
+    features = {"inventory_quantity": 5, "price": 9.5, "shipment_duration": 0}
+
+    assert Validator.validate_features(features, ("inventory_quantity", "price", "shipment_duration")) == [5, 9.5, 0]
@@ -0,0 +1,132 @@
+import glob
+import os
+
+import pytest
+
+import blockchain.verification as verification
+from blockchain.blockchain import HASH_SIZE, Blockchain, decode_block, encode_block
+from blockchain.storage import SegmentBlockStorage
+from blockchain.verification import verify_chain
+
+BLOCKS = 120
+RANGE_SIZE = 25
+
+
+def _open(directory):
+    return SegmentBlockStorage(str(directory), encode_block, decode_block, segment_max_bytes=4096)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    storage = _open(tmp_path)
+    chain = Blockchain(storage)
+    for number in range(BLOCKS - 1):
+        chain.add_block({"transaction": number})
+    yield tmp_path, storage, chain
+    storage.close()
+
+
+def _tamper(directory, storage, index, position=-HASH_SIZE - 2):
+    # Changes one byte of the block in its segment file (by default in its payload), keeping every length intact
+    raw = bytes(storage.read_raw(index))
+    position %= len(raw)
+    for path in glob.glob(os.path.join(directory, "segment-*.log")):
+        with open(path, "r+b") as data:
+            content = data.read()
+            offset = content.find(raw)
+            if offset >= 0:
+                data.seek(offset + position)
+                data.write(bytes([raw[position] ^ 1]))
+                return
+    raise AssertionError(f"block {index} not found")
+
+
+def _without_timing(result):
+    return {key: value for key, value in result.items() if key != "seconds"}
+
+
+def test_incremental_run_only_checks_blocks_after_the_checkpoint(ledger):
+    _, storage, chain = ledger
+
+    first = verify_chain(storage, workers=1, range_size=RANGE_SIZE)
+    assert first["valid"] and first["mode"] == "full" and first["checked"] == BLOCKS
+    assert storage.load_checkpoint() == (BLOCKS - 1, bytes(storage.read_raw(BLOCKS - 1)[-HASH_SIZE:]))
+
+    for number in range(10):
+        chain.add_block({"transaction": f"new {number}"})
+    second = verify_chain(storage, workers=1, range_size=RANGE_SIZE)
+    assert second["valid"] and second["mode"] == "incremental"
+    assert (second["from_index"], second["to_index"], second["checked"]) == (BLOCKS, BLOCKS + 9, 10)
+
+
+def test_tampered_block_after_the_checkpoint_is_detected(ledger):
+    directory, storage, chain = ledger
+    assert verify_chain(storage, workers=1, range_size=RANGE_SIZE)["valid"]
+    for number in range(10):
+        chain.add_block({"transaction": f"new {number}"})
+    storage.close()
+
+    reopened = _open(directory)
+    try:
+        _tamper(directory, reopened, BLOCKS + 4)
+        result = verify_chain(reopened, workers=1, range_size=RANGE_SIZE)
+        assert not result["valid"] and result["mode"] == "incremental"
+        assert result["error"] == {"index": BLOCKS + 4, "reason": "block hash does not match its contents"}
+        # A failed run does not move the checkpoint past the broken block
+        assert reopened.load_checkpoint()[0] == BLOCKS - 1
+    finally:
+        reopened.close()
+
+
+def test_changed_checkpoint_block_is_detected(ledger):
+    directory, storage, _ = ledger
+    assert verify_chain(storage, workers=1, range_size=RANGE_SIZE)["valid"]
+    storage.close()
+
+    reopened = _open(directory)
+    try:
+        # A rewritten block: its stored hash no longer matches the one the checkpoint recorded
+        _tamper(directory, reopened, BLOCKS - 1, position=-1)
+        result = verify_chain(reopened, workers=1, range_size=RANGE_SIZE)
+        assert result["error"] == {"index": BLOCKS - 1, "reason": "block changed since it was last verified"}
+        # A full run re-verifies everything and reports the same block
+        full = verify_chain(reopened, full=True, workers=1, range_size=RANGE_SIZE)
+        assert full["error"] == {"index": BLOCKS - 1, "reason": "block hash does not match its contents"}
+    finally:
+        reopened.close()
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    # Records the start method of every process pool verify_chain creates
+    created = []
+    executor = verification.ProcessPoolExecutor
+
+    def spy(*args, **kwargs):
+        created.append(kwargs["mp_context"].get_start_method())
+        return executor(*args, **kwargs)
+
+    monkeypatch.setattr(verification, "ProcessPoolExecutor", spy)
+    return created
+
+
+@pytest.mark.parametrize("tampered", [None, 0, 1, RANGE_SIZE - 1, RANGE_SIZE, 3 * RANGE_SIZE + 7, BLOCKS - 1])
+def test_parallel_result_matches_sequential(ledger, pools, tampered):
+    directory, storage, _ = ledger
+    if tampered is not None:
+        storage.close()
+        storage = _open(directory)
+        _tamper(directory, storage, tampered)
+    try:
+        sequential = verify_chain(storage, full=True, workers=1, range_size=RANGE_SIZE)
+        assert pools == []
+        parallel = verify_chain(storage, full=True, workers=3, range_size=RANGE_SIZE)
+        assert pools == [verification._POOL_START_METHOD]
+        assert verification._POOL_START_METHOD in ("forkserver", "spawn")
+
+        assert _without_timing(parallel) == _without_timing(sequential)
+        assert parallel["valid"] == (tampered is None)
+        if tampered is not None:
+            assert parallel["error"]["index"] == tampered
+    finally:
+        storage.close()